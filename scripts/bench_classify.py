@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Benchmarks del clasificador de lesiones y del aplanado, sobre el CSV flat ya generado.
+
+Cada caso reporta filas/seg (mejor de --repeat pasadas), latencia por fila p50/p99 y
+memoria asignada por fila (tracemalloc), y se compara con la línea base guardada en
+bench_baseline.json (solo si se midió con las mismas filas, máquina y versión de Python):
+si un caso empeora más que la tolerancia, termina con código 1.
+Además comprueba que todas las variantes del clasificador den la misma salida que
+classify_injury_reference.
+
+Ejemplo:
+    python scripts/bench_classify.py                    # compara con la línea base
+    python scripts/bench_classify.py --save-baseline    # tras una mejora confirmada
+    python scripts/bench_classify.py --only aplanado --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import fetch_mlb_injuries_transactions as mlb
+from mlb_api_stub import row_to_transaction
+
+DEFAULT_CSV = Path(__file__).resolve().parent.parent / "data" / "mlb_transactions_flat_2015_2025.csv"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "bench_baseline.json"
+
+
+@dataclass
+class Case:
+    name: str
+    inputs: str  # "descriptions" o "transactions"
+    per_row: Optional[Callable[[object], object]]  # None = solo por lote (sin latencia por fila)
+    batch: Callable[[list], list]
+    memo: bool = False  # reinicia las caches antes de cada pasada (medición en frío)
+    check: bool = False  # su salida debe coincidir con classify_injury_reference
+
+
+@dataclass
+class Result:
+    rows_per_sec: float
+    p50_us: Optional[float]
+    p99_us: Optional[float]
+    alloc_bytes_per_row: float
+    alloc_blocks_per_row: float
+
+
+def reset_memo() -> None:
+    mlb._classify_template.cache_clear()
+    mlb._TEMPLATE_WORDS.clear()
+
+
+def classify_batch(descriptions: List[str]) -> List[Dict[str, object]]:
+    codes, results = mlb.classify_templates(descriptions)
+    return [results[code] for code in codes]
+
+
+def without_prefilter(description: str) -> Dict[str, object]:
+    return dict(mlb._classify_template(mlb.injury_template(description)))
+
+
+CASES = [
+    Case("referencia", "descriptions", mlb.classify_injury_reference,
+         lambda ds: [mlb.classify_injury_reference(d) for d in ds], check=True),
+    Case("escaneo único", "descriptions", mlb.classify_injury_fused,
+         lambda ds: [mlb.classify_injury_fused(d) for d in ds], check=True),
+    Case("plantilla + LRU", "descriptions", without_prefilter,
+         lambda ds: [without_prefilter(d) for d in ds], memo=True, check=True),
+    Case("classify_injury", "descriptions", mlb.classify_injury,
+         lambda ds: [mlb.classify_injury(d) for d in ds], memo=True, check=True),
+    Case("classify_templates", "descriptions", None, classify_batch, memo=True, check=True),
+    Case("aplanado por fila", "transactions", mlb.flatten_transaction,
+         lambda txs: [mlb.flatten_transaction(tx) for tx in txs], memo=True),
+    Case("aplanado por ventana", "transactions", None, mlb.flatten_window, memo=True),
+]
+
+
+def percentile(sorted_values: List[int], q: float) -> float:
+    return float(sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))])
+
+
+def measure(case: Case, items: list, repeat: int) -> tuple:
+    n = len(items)
+    best = float("inf")
+    out: list = []
+    for _ in range(max(1, repeat)):
+        if case.memo:
+            reset_memo()
+        out = []
+        gc.collect()
+        start = time.perf_counter()
+        out = case.batch(items)
+        best = min(best, time.perf_counter() - start)
+
+    p50 = p99 = None
+    if case.per_row is not None:
+        if case.memo:
+            reset_memo()
+        func, clock = case.per_row, time.perf_counter_ns
+        samples = [0] * n
+        for i, item in enumerate(items):
+            t0 = clock()
+            func(item)
+            samples[i] = clock() - t0
+        samples.sort()
+        p50, p99 = percentile(samples, 0.50) / 1000, percentile(samples, 0.99) / 1000
+
+    # Memoria: total asignado durante la pasada (pico) y bloques que siguen vivos al terminar
+    if case.memo:
+        reset_memo()
+    gc.collect()
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    kept = case.batch(items)
+    blocks_after = sys.getallocatedblocks()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+
+    result = Result(
+        rows_per_sec=n / best,
+        p50_us=p50,
+        p99_us=p99,
+        alloc_bytes_per_row=peak / n,
+        alloc_blocks_per_row=(blocks_after - blocks_before) / n,
+    )
+    return result, out
+
+
+def fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def regressions(name: str, current: Result, base: dict, tolerance: float, alloc_tolerance: float) -> List[str]:
+    found: List[str] = []
+    if current.rows_per_sec < base["rows_per_sec"] * (1 - tolerance):
+        found.append(f"{name}: {current.rows_per_sec:,.0f} filas/s (base {base['rows_per_sec']:,.0f})")
+    # p99 se reporta pero no se exige: en una máquina compartida varía el doble entre corridas.
+    # p50 lleva 0.5 µs de holgura, del orden del ruido del reloj en los casos más rápidos
+    now, then = current.p50_us, base.get("p50_us")
+    if now is not None and then is not None and now > then * (1 + tolerance) + 0.5:
+        found.append(f"{name}: p50 {now:.2f} µs (base {then:.2f})")
+    for key in ("alloc_bytes_per_row", "alloc_blocks_per_row"):
+        now, then = getattr(current, key), base.get(key)
+        if then is not None and now > then * (1 + alloc_tolerance) + 0.5:
+            found.append(f"{name}: {key} {now:.1f} (base {then:.1f})")
+    return found
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    p.add_argument("--csv", type=Path, default=DEFAULT_CSV, help="CSV flat (mlb_transactions_flat_*.csv)")
+    p.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="JSON con la línea base")
+    p.add_argument("--save-baseline", action="store_true", help="Guarda esta corrida como línea base")
+    p.add_argument("--repeat", type=int, default=3, help="Pasadas por caso (se toma la mejor)")
+    p.add_argument("--limit", type=int, default=None, help="Usa solo las primeras N filas del CSV")
+    p.add_argument("--only", default=None, help="Ejecuta solo los casos que contengan este texto")
+    p.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.30,
+        help="Empeoramiento aceptado en filas/s y latencia p50 antes de fallar (0.30 = 30%%)",
+    )
+    p.add_argument(
+        "--alloc-tolerance",
+        type=float,
+        default=0.10,
+        help="Aumento aceptado en memoria asignada por fila antes de fallar",
+    )
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    gc.set_threshold(*mlb.GC_THRESHOLD)  # como en el script principal
+    if not args.csv.exists():
+        print(f"[ERROR] No existe {args.csv}", file=sys.stderr)
+        return 1
+    rows = mlb.read_flat_csv(args.csv)[: args.limit]
+    inputs = {
+        "descriptions": [row.description or "" for row in rows],
+        "transactions": [row_to_transaction(row) for row in rows],
+    }
+    n = len(rows)
+    passed = sum(1 for d in inputs["descriptions"] if mlb.may_be_injury(d))
+    print(f"[INFO] {n} filas; el prefiltro deja pasar {passed} ({passed / max(1, n):.1%})")
+
+    environment = {"rows": n, "python": platform.python_version(), "machine": platform.machine()}
+    baseline: Dict[str, dict] = {}
+    if args.baseline.exists() and not args.save_baseline:
+        stored = json.loads(args.baseline.read_text(encoding="utf-8"))
+        # Filas/s y latencias de otra máquina u otra versión de Python no son comparables
+        differ = [f"{k} {stored.get(k)} (ahora {v})" for k, v in environment.items() if stored.get(k) != v]
+        if differ:
+            print(f"[WARN] La línea base se midió con {', '.join(differ)}; no se compara", file=sys.stderr)
+        else:
+            baseline = stored.get("cases", {})
+
+    expected: Optional[list] = None
+    results: Dict[str, Result] = {}
+    mismatches: List[str] = []
+    failures: List[str] = []
+    print(f"  {'caso':<22} {'filas/s':>11} {'p50 µs':>8} {'p99 µs':>8} {'bytes/fila':>11} {'bloques/fila':>13}")
+    for case in CASES:
+        if args.only and args.only not in case.name:
+            continue
+        result, out = measure(case, inputs[case.inputs], args.repeat)
+        results[case.name] = result
+        if case.check:
+            if expected is None:
+                expected = [mlb.classify_injury_reference(d) for d in inputs["descriptions"]]
+            if out != expected:
+                mismatches.append(case.name)
+        base = baseline.get(case.name)
+        change = f"  ({result.rows_per_sec / base['rows_per_sec'] - 1:+.0%} vs base)" if base else ""
+        print(
+            f"  {case.name:<22} {result.rows_per_sec:>11,.0f} {fmt(result.p50_us):>8} "
+            f"{fmt(result.p99_us):>8} {result.alloc_bytes_per_row:>11.1f} "
+            f"{result.alloc_blocks_per_row:>13.2f}{change}"
+        )
+        if base:
+            failures.extend(regressions(case.name, result, base, args.tolerance, args.alloc_tolerance))
+
+    if args.save_baseline:
+        stored = {
+            **environment,
+            "cases": {
+                name: {k: v if v is None else round(v, 3) for k, v in asdict(r).items()}
+                for name, r in results.items()
+            },
+        }
+        if args.baseline.exists():
+            # Un --only parcial conserva los casos que no se midieron
+            previous = json.loads(args.baseline.read_text(encoding="utf-8"))
+            if all(previous.get(k) == v for k, v in environment.items()):
+                stored["cases"] = {**previous.get("cases", {}), **stored["cases"]}
+        args.baseline.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"[OK] Línea base guardada en {args.baseline}")
+
+    if mismatches:
+        print(f"[ERROR] Salida distinta de classify_injury_reference: {', '.join(mismatches)}", file=sys.stderr)
+    for failure in failures:
+        print(f"[REGRESIÓN] {failure}", file=sys.stderr)
+    return 1 if mismatches or failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Comprueba iter_json_array (el decodificador de --stream) con bloques de lectura pequeños.
+
+Para cada tamaño de bloque verifica que:
+  - los elementos salgan iguales que con json.loads, incluidos números cortados justo en el
+    borde de un bloque ("1" | ".5", "1" | "e5");
+  - cada elemento salga sin haber leído mucho más allá de su final (la memoria queda acotada
+    por un elemento, no por el cuerpo completo).
+
+Ejemplo:
+    python scripts/check_json_stream.py
+    python scripts/check_json_stream.py --rows 20000 --chunk-sizes 1,7,65536
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import random
+import sys
+from typing import List, Tuple
+
+from fetch_mlb_injuries_transactions import iter_json_array
+
+
+class CountingReader(io.BytesIO):
+    """BytesIO que recuerda hasta dónde se leyó."""
+
+    def __init__(self, data: bytes) -> None:
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = super().read(size)
+        self.consumed += len(data)
+        return data
+
+
+def build_document(rows: int, seed: int) -> Tuple[bytes, List[object], List[int]]:
+    # Documento con la forma de /transactions (más escalares sueltos) y el offset en bytes
+    # donde termina cada elemento del array
+    rng = random.Random(seed)
+    items: List[object] = [1.5, 2, 1e5, -0.25e-3, 12345678901234567890, True, False, None, "aé"]
+    for i in range(rows):
+        items.append(
+            {
+                "id": 200000 + i,
+                "date": f"2020-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "description": "placed RHP on the 10-day injured list " + "x" * rng.randint(0, 300),
+                "person": {"id": rng.randint(1, 10**6), "fullName": "José Pérez"},
+                "ratio": rng.random() * 1e3,
+            }
+        )
+    head = b'{"copyright": "Copyright 2025 MLB Advanced Media", "transactions": ['
+    parts = [head]
+    ends: List[int] = []
+    offset = len(head)
+    for i, item in enumerate(items):
+        piece = (", " if i else "").encode("utf-8") + json.dumps(item).encode("utf-8")
+        parts.append(piece)
+        offset += len(piece)
+        ends.append(offset)
+    parts.append(b'], "totalSize": 1}')
+    return b"".join(parts), items, ends
+
+
+def check(data: bytes, expected: List[object], ends: List[int], chunk_size: int) -> List[str]:
+    problems: List[str] = []
+    reader = CountingReader(data)
+    got: List[object] = []
+    # Al salir un elemento solo puede haberse leído hasta el bloque que contiene el carácter
+    # siguiente a su final
+    slack = 2 * chunk_size + 1
+    for i, item in enumerate(iter_json_array(reader, "transactions", chunk_size=chunk_size)):
+        if i < len(ends) and reader.consumed > ends[i] + slack:
+            problems.append(
+                f"bloque {chunk_size}: elemento {i} salió con {reader.consumed} bytes leídos "
+                f"(termina en {ends[i]})"
+            )
+            break
+        got.append(item)
+    else:
+        if got != expected:
+            first = next((i for i, (a, b) in enumerate(zip(got, expected)) if a != b), len(got))
+            problems.append(f"bloque {chunk_size}: el elemento {first} no coincide con json.loads")
+    return problems
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=2000, help="Transacciones en el documento de prueba")
+    p.add_argument(
+        "--chunk-sizes",
+        default="1,2,3,4,5,7,8,13,64,1000,65536",
+        help="Tamaños de bloque a probar, separados por coma",
+    )
+    p.add_argument("--seed", type=int, default=1)
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    data, expected, ends = build_document(args.rows, args.seed)
+    problems: List[str] = []
+    sizes = [int(x) for x in args.chunk_sizes.split(",") if x.strip()]
+    for chunk_size in sizes:
+        problems.extend(check(data, expected, ends, chunk_size))
+    for problem in problems:
+        print(f"[ERROR] {problem}", file=sys.stderr)
+    if not problems:
+        print(f"[OK] {len(expected)} elementos, {len(data)} bytes, bloques {sizes}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -11,20 +11,51 @@ Rango por defecto: 2015-01-01 a 2025-12-31
 from __future__ import annotations
 
 import argparse
+import asyncio
+import codecs
 import csv
+import gc
+import gzip
+import hashlib
+import http.client
 import json
+import multiprocessing
+import os
+import random
 import re
+import shutil
+import ssl
 import sys
+import threading
 import time
-from collections import Counter
-from datetime import date, datetime, timedelta
+import zlib
+from array import array
+from collections import Counter, deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import accumulate, islice
+from operator import attrgetter, itemgetter
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
-from urllib.request import urlopen
-from urllib.parse import urlencode
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import parse_qsl, urlencode, urlsplit
 
+try:
+    import numpy as np
+except ImportError:  # opcional: classify_many devuelve listas si no está
+    np = None
 
-BASE_URL = "https://statsapi.mlb.com/api/v1/transactions"
+try:
+    import pandas as pd
+except ImportError:  # opcional: solo para load_frame
+    pd = None
+
+
+API_ROOT = "https://statsapi.mlb.com/api/v1"
+BASE_URL = f"{API_ROOT}/transactions"
 
 
 INJURY_KEYWORDS = [
@@ -50,23 +81,46 @@ IL_ACTIVATION_RE = re.compile(
 REHAB_ASSIGNMENT_RE = re.compile(r"\brehab assignment\b", re.IGNORECASE)
 IL_DAY_CLASS_RE = re.compile(r"\b(7|10|15|60)-day (?:injured|disabled) list\b", re.IGNORECASE)
 
+# Clasificador en una pasada: cada alternativa es una pieza de las regex IL_*_RE /
+# REHAB_ASSIGNMENT_RE (mismos \b e IGNORECASE); las secuencias se arman con CLASSIFY_CHAINS.
+CLASSIFY_TOKEN_RE = re.compile(
+    r"\b(?:(?P<placed>placed)|(?P<transferred>transferred)|(?P<activated>activated|reinstated)"
+    r"|(?P<on>on the)|(?P<to>to the)|(?P<from>from the)|(?P<rehab>rehab assignment)"
+    r"|(?:(?P<days>7|10|15|60)-day )?(?P<list>(?:injured|disabled) list))\b",
+    re.IGNORECASE,
+)
+CLASSIFY_CHAINS = {
+    "is_il_placement": ("placed", "on", "list"),
+    "is_il_transfer": ("transferred", "list", "to", "list"),
+    "is_il_activation": ("activated", "from", "list"),
+}
+# Substrings que classify_injury busca en el texto en minúsculas; todas contienen alguna
+# de INJURY_KEYWORDS, así que cualquier coincidencia implica is_injury_related.
+KEYWORD_SCAN_TERMS = sorted(set(INJURY_KEYWORDS) | {"concussion disabled list"}, key=len, reverse=True)
+KEYWORD_SCAN_RE = re.compile("|".join(re.escape(k) for k in KEYWORD_SCAN_TERMS))
+
+# Prefiltro: los términos mínimos (todo KEYWORD_SCAN_TERMS contiene alguno). Con tan pocos,
+# un `in` por término (búsqueda en C) rinde más que un autómata Aho-Corasick en Python.
+PREFILTER_TERMS = tuple(
+    k for k in KEYWORD_SCAN_TERMS if not any(o != k and o in k for o in KEYWORD_SCAN_TERMS)
+)
+CLASSIFY_PREFILTER = True
+
+# Plantillas para el cache de classify_injury: una palabra que no contiene ninguna de estas
+# (palabras de CLASSIFY_TOKEN_RE con \b, o trozos de KEYWORD_SCAN_TERMS) no puede formar
+# parte de ninguna coincidencia y se reemplaza por "#" sin cambiar la clasificación.
+TEMPLATE_TOKEN_WORD_RE = re.compile(
+    r"\b(?:placed|transferred|activated|reinstated|on|to|the|from|rehab|assignment"
+    r"|injured|disabled|list|day|7|10|15|60)\b",
+    re.IGNORECASE,
+)
+TEMPLATE_KEYWORD_WORD_RE = re.compile(
+    "|".join(sorted({re.escape(w) for k in KEYWORD_SCAN_TERMS for w in k.split(" ")}))
+)
+CLASSIFY_CACHE_SIZE = 4096
 
-RAW_COLUMNS = [
-    "transaction_id",
-    "api_date",
-    "effective_date",
-    "resolution_date",
-    "event_date",
-    "year",
-    "type_code",
-    "type_desc",
-    "description",
-    "person_id",
-    "person_name",
-    "from_team_id",
-    "from_team_name",
-    "to_team_id",
-    "to_team_name",
+# Campos de classify_injury, en orden; los de 0/1 van como uint8 en classify_many
+CLASSIFY_COLUMNS = [
     "is_injury_related",
     "injury_event_type",
     "is_il_placement",
@@ -75,37 +129,1251 @@ RAW_COLUMNS = [
     "is_rehab_assignment",
     "is_covid_il",
     "il_days_bucket",
+    "count_as_new_injury_registration",
 ]
+CLASSIFY_TEXT_COLUMNS = {"injury_event_type", "il_days_bucket"}
+FLATTEN_BATCH_SIZE = 4096
+TEMPLATE_WORDS_MAX = 200_000
 
 
-INJURY_COLUMNS = RAW_COLUMNS + [
-    "count_as_new_injury_registration",
-]
+# Esquema tipado de las salidas: tipo lógico de cada columna, en el orden del CSV. Lo usan
+# TransactionColumns (tipo de cada array), write_csv y los loaders (read_flat_csv, load_frame)
+#   id        entero de 64 bits que puede faltar (vacío en el CSV)
+#   int       entero de 64 bits, siempre presente
+#   float     número decimal o vacío
+#   flag      0/1 (uint8); vacío o ausente se lee como 0
+#   date      fecha ISO AAAA-MM-DD o vacío
+#   category  texto con pocos valores distintos
+#   text      texto libre
+RAW_SCHEMA: Dict[str, str] = {
+    "transaction_id": "id",
+    "api_date": "date",
+    "effective_date": "date",
+    "resolution_date": "date",
+    "event_date": "date",
+    "year": "id",
+    "type_code": "category",
+    "type_desc": "category",
+    "description": "text",
+    "person_id": "id",
+    "person_name": "text",
+    "from_team_id": "id",
+    "from_team_name": "category",
+    "to_team_id": "id",
+    "to_team_name": "category",
+    "is_injury_related": "flag",
+    "injury_event_type": "category",
+    "is_il_placement": "flag",
+    "is_il_activation": "flag",
+    "is_il_transfer": "flag",
+    "is_rehab_assignment": "flag",
+    "is_covid_il": "flag",
+    "il_days_bucket": "category",
+}
+RAW_COLUMNS = list(RAW_SCHEMA)
 
+INJURY_SCHEMA: Dict[str, str] = {**RAW_SCHEMA, "count_as_new_injury_registration": "flag"}
+INJURY_COLUMNS = list(INJURY_SCHEMA)
+
+INT_KINDS = {"id", "int", "flag"}
+# Cómo se escribe cada tipo en el CSV (None = tal cual) y con qué dtype lo lee load_frame
+CSV_FORMATS: Dict[str, Optional[Callable[[object], object]]] = {
+    "id": int,
+    "int": int,
+    "flag": int,
+    "date": lambda v: str(v)[:10],
+}
+PANDAS_DTYPES = {
+    "id": "Int64",
+    "int": "int64",
+    "float": "float64",
+    "flag": "uint8",
+    "category": "category",
+    "text": "string",
+}
+
+
+class TransactionRow(namedtuple("TransactionRow", INJURY_COLUMNS)):
+    """Transacción aplanada (una por jugador): tupla con nombre, sin un dict por fila."""
+
+    __slots__ = ()
+
+
+# Valores de classify_injury en el orden de los últimos campos de TransactionRow
+CLASSIFY_VALUES = itemgetter(*CLASSIFY_COLUMNS)
+
+# Umbrales del recolector para main(): con el de fábrica (700) cada pocas filas se recorren
+# las tuplas recién creadas, y aplanar una década cuesta ~40% más
+GC_THRESHOLD = (50_000, 20, 20)
+
+
+# Columnas de TransactionColumns: enteros (array('q'), NULL_INT = vacío; banderas en
+# array('B')), textos repetidos codificados contra un diccionario (array('i')) y la
+# descripción como offsets + bytes
+INT_COLUMNS = [name for name, kind in INJURY_SCHEMA.items() if kind in INT_KINDS]
+CODED_COLUMNS = [name for name, kind in INJURY_SCHEMA.items() if kind not in INT_KINDS and name != "description"]
+INT_TYPECODES = {name: "B" if INJURY_SCHEMA[name] == "flag" else "q" for name in INT_COLUMNS}
+NULL_INT = -(2**63)
+# Archivo compacto por columnas (--columnar): cambia la versión si cambia el formato
+COLUMNS_FORMAT = "mlb-transaction-columns"
+COLUMNS_FORMAT_VERSION = 2
+
+
+DAILY_SCHEMA: Dict[str, str] = {
+    "date": "date",
+    "year": "int",
+    "injury_registrations": "int",         # colocaciones nuevas en IL
+    "injury_related_transactions": "int",  # cualquier evento de lesión (IL/rehab)
+    "il_activations": "int",
+    "il_transfers": "int",
+    "rehab_assignments": "int",
+}
+DAILY_COLUMNS = list(DAILY_SCHEMA)
+
+# Huella del código: invalida resultados derivados guardados en cache (ResponseCache.put_derived)
+SCRIPT_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+
+# sportId de la API -> nombre corto para logs y archivos
+SPORT_LABELS = {
+    1: "MLB",
+    11: "AAA",
+    12: "AA",
+    13: "A+",
+    14: "A",
+    16: "ROK",
+    17: "WIN",
+}
+
+
+ACCEPT_ENCODING = "gzip, deflate"
+
+
+class BodyDecoder:
+    """Descompresión incremental según Content-Encoding (gzip/deflate/identity)."""
+
+    def __init__(self, encoding: Optional[str]) -> None:
+        self.encoding = (encoding or "identity").strip().lower()
+        if self.encoding in ("gzip", "x-gzip"):
+            wbits: Optional[int] = 16 + zlib.MAX_WBITS
+        elif self.encoding == "deflate":
+            wbits = zlib.MAX_WBITS
+        else:
+            wbits = None
+        self._z = zlib.decompressobj(wbits) if wbits is not None else None
+        self._first = True
+        self.wire_bytes = 0
+        self.body_bytes = 0
+
+    def feed(self, data: bytes) -> bytes:
+        self.wire_bytes += len(data)
+        if self._z is None:
+            out = data
+        else:
+            try:
+                out = self._z.decompress(data)
+            except zlib.error:
+                # Algunos servidores mandan "deflate" sin cabecera zlib
+                if not (self._first and self.encoding == "deflate"):
+                    raise
+                self._z = zlib.decompressobj(-zlib.MAX_WBITS)
+                out = self._z.decompress(data)
+        self._first = False
+        self.body_bytes += len(out)
+        return out
+
+    def flush(self) -> bytes:
+        out = self._z.flush() if self._z is not None else b""
+        self.body_bytes += len(out)
+        return out
+
+
+class DecodedResponse:
+    # Envuelve HTTPResponse: read() devuelve el cuerpo ya descomprimido, por bloques
+    def __init__(self, resp: http.client.HTTPResponse) -> None:
+        self.resp = resp
+        self.status = resp.status
+        self.headers = resp.headers
+        self.decoder = BodyDecoder(resp.getheader("Content-Encoding"))
+        # Lo ya descomprimido y aún no leído es self._buf[self._pos:]
+        self._buf = bytearray()
+        self._pos = 0
+        self._eof = False
+
+    @property
+    def wire_bytes(self) -> int:
+        return self.decoder.wire_bytes
+
+    @property
+    def body_bytes(self) -> int:
+        return self.decoder.body_bytes
+
+    def _pull(self, size: int) -> bytes:
+        data = self.resp.read(size)
+        if data:
+            return self.decoder.feed(data)
+        self._eof = True
+        return self.decoder.flush()
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            # Los bloques se juntan una sola vez: ir sumando bytes es cuadrático en el cuerpo
+            parts = [bytes(self._buf[self._pos :])]
+            self._buf.clear()
+            self._pos = 0
+            while not self._eof:
+                parts.append(self._pull(1 << 16))
+            return b"".join(parts)
+        while len(self._buf) - self._pos < size and not self._eof:
+            self._buf += self._pull(size)
+        out = bytes(self._buf[self._pos : self._pos + size])
+        self._pos += len(out)
+        if self._pos == len(self._buf):
+            self._buf.clear()
+            self._pos = 0
+        elif self._pos > 1 << 16 and 2 * self._pos > len(self._buf):
+            # Compacta de vez en cuando en lugar de recortar en cada lectura
+            del self._buf[: self._pos]
+            self._pos = 0
+        return out
+
+
+class FetchMetrics:
+    """Registro por petición: resultado, intentos, latencia y bytes (en la red vs. descomprimidos)."""
+
+    def __init__(self) -> None:
+        self.requests: List[Dict[str, object]] = []
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        url: str,
+        outcome: str,
+        attempts: int = 0,
+        latency_s: Optional[float] = None,
+        elapsed_s: Optional[float] = None,
+        encoding: Optional[str] = None,
+        wire_bytes: int = 0,
+        body_bytes: int = 0,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self.requests.append(
+                {
+                    "url": url,
+                    "outcome": outcome,
+                    "attempts": attempts,
+                    "latency_s": round(latency_s, 4) if latency_s is not None else None,
+                    "elapsed_s": round(elapsed_s, 4) if elapsed_s is not None else None,
+                    "encoding": encoding,
+                    "wire_bytes": wire_bytes,
+                    "body_bytes": body_bytes,
+                    "error": error,
+                }
+            )
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            net = [r for r in self.requests if r["outcome"] != "cache"]
+        latencies = sorted(float(r["latency_s"]) for r in net if r["latency_s"] is not None)
+        return {
+            "requests": len(net),
+            "failed": sum(1 for r in net if r["outcome"] not in ("ok", "not_modified")),
+            "not_modified": sum(1 for r in net if r["outcome"] == "not_modified"),
+            "retries": sum(max(0, int(r["attempts"]) - 1) for r in net),
+            "wire_bytes": sum(int(r["wire_bytes"]) for r in net),
+            "body_bytes": sum(int(r["body_bytes"]) for r in net),
+            "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+            "elapsed_s": sum(float(r["elapsed_s"] or 0) for r in net),
+        }
+
+
+FETCH_METRICS = FetchMetrics()
+
+
+METRICS_SCHEMA: Dict[str, str] = {
+    "url": "text",
+    "outcome": "category",
+    "attempts": "int",
+    "latency_s": "float",
+    "elapsed_s": "float",
+    "encoding": "category",
+    "wire_bytes": "id",
+    "body_bytes": "id",
+    "error": "text",
+}
+
+
+class HttpPool:
+    """Conexiones keep-alive reutilizables entre peticiones e hilos, por host."""
+
+    def __init__(self, max_idle_per_host: int = 8, timeout: float = 120) -> None:
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _new_connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _acquire(self, key: Tuple[str, str]) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(*key), False
+
+    def _release(self, key: Tuple[str, str], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+    @contextmanager
+    def open(self, url: str, headers: Optional[Dict[str, str]] = None) -> Iterator[DecodedResponse]:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        send_headers = {
+            "Connection": "keep-alive",
+            "Accept-Encoding": ACCEPT_ENCODING,
+            **(headers or {}),
+        }
+
+        conn, reused = self._acquire(key)
+        while True:
+            try:
+                conn.request("GET", path, headers=send_headers)
+                resp = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError):
+                conn.close()
+                if not reused:
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+            # Una conexión ociosa pudo haber sido cerrada por el servidor: se reintenta una vez
+            # con una nueva, que también se cierra si falla
+            conn, reused = self._new_connection(*key), False
+
+        try:
+            if resp.status >= 400:
+                resp.read()
+                raise HTTPError(url, resp.status, resp.reason, resp.headers, None)
+            yield DecodedResponse(resp)
+        finally:
+            # Solo vuelve al pool si la respuesta se consumió completa
+            if resp.isclosed() and not resp.will_close:
+                self._release(key, conn)
+            else:
+                conn.close()
+
+
+HTTP_POOL = HttpPool()
 
-DAILY_COLUMNS = [
-    "date",
-    "year",
-    "injury_registrations",        # colocaciones nuevas en IL
-    "injury_related_transactions", # cualquier evento de lesión (IL/rehab)
-    "il_activations",
-    "il_transfers",
-    "rehab_assignments",
-]
 
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path}?{query}"
 
-def fetch_json(url: str, retries: int = 3, sleep_seconds: float = 1.5) -> dict:
-    last_error: Optional[Exception] = None
-    for attempt in range(1, retries + 1):
+
+def url_range_end_year(url: str) -> Optional[int]:
+    params = dict(parse_qsl(urlsplit(url).query))
+    if params.get("endDate"):
+        return int(params["endDate"][:4])
+    if params.get("season"):
+        return int(params["season"])
+    return None
+
+
+def response_validators(headers: Optional[http.client.HTTPMessage]) -> Dict[str, str]:
+    # ETag / Last-Modified de una respuesta, tal como se guardan en el .meta.json
+    if headers is None:
+        return {}
+    validators = {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+    return {k: v for k, v in validators.items() if v}
+
+
+class ResponseCache:
+    """Cache en disco de respuestas crudas, direccionado por el hash de la URL normalizada."""
+
+    # Al pasar max_bytes se desalojan entradas hasta esta fracción, para que un cache lleno
+    # no vuelva a recorrerse en cada commit
+    EVICT_TO = 0.9
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int = 512 * 1024 * 1024,
+        current_ttl: float = 3600,
+        revalidate: bool = False,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.current_ttl = current_ttl
+        # revalidate=True: toda entrada con ETag/Last-Modified se confirma con la API
+        # (petición condicional) aunque no haya vencido, incluso de temporadas cerradas
+        self.revalidate = revalidate
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+        # Bytes en disco, llevado al día en cada escritura; None = aún sin medir
+        self._size: Optional[int] = None
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        digest = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        folder = self.root / digest[:2]
+        return folder / f"{digest}.json", folder / f"{digest}.meta.json"
+
+    def _derived_path(self, url: str, name: str) -> Path:
+        body_path, _ = self._paths(url)
+        return body_path.with_name(f"{body_path.name[: -len('.json')]}.{name}.derived")
+
+    def ttl_for(self, url: str) -> Optional[float]:
+        # Temporadas cerradas no cambian: sin expiración. La temporada actual, TTL corto.
+        end_year = url_range_end_year(url)
+        if end_year is not None and end_year < date.today().year:
+            return None
+        return self.current_ttl
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _read_meta(meta_path: Path) -> Optional[dict]:
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _grow(self, delta: int) -> None:
+        with self._lock:
+            if self._size is not None:
+                self._size += delta
+
+    def _replace(self, src: Path, dest: Path) -> None:
+        # os.replace que actualiza el total de bytes del cache
+        delta = src.stat().st_size
+        try:
+            delta -= dest.stat().st_size
+        except OSError:
+            pass
+        os.replace(src, dest)
+        self._grow(delta)
+
+    @staticmethod
+    def _write_meta(meta_path: Path, meta: dict) -> Path:
+        tmp_meta = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+        return tmp_meta
+
+    def _lookup(self, url: str) -> Optional[Path]:
+        # Ruta del cuerpo si hay una entrada vigente (cuenta hit/miss y marca el uso)
+        body_path, meta_path = self._paths(url)
+        meta = self._read_meta(meta_path)
+        if meta is None:
+            self._count(False)
+            return None
+
+        ttl = self.ttl_for(url)
+        if ttl is not None and time.time() - meta.get("stored_at", 0) > ttl:
+            self._count(False)
+            return None
+        if self.revalidate and (meta.get("etag") or meta.get("last_modified")):
+            self._count(False)
+            return None
+
+        # mtime del cuerpo = último uso (para LRU)
+        try:
+            os.utime(body_path)
+        except OSError:
+            self._count(False)
+            return None
+        self._count(True)
+        return body_path
+
+    def get(self, url: str) -> Optional[bytes]:
+        body_path = self._lookup(url)
+        if body_path is None:
+            return None
+        try:
+            return body_path.read_bytes()
+        except OSError:
+            return None
+
+    def open(self, url: str) -> Optional[BinaryIO]:
+        body_path = self._lookup(url)
+        if body_path is None:
+            return None
+        try:
+            return body_path.open("rb")
+        except OSError:
+            return None
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        # If-None-Match / If-Modified-Since para pedir de nuevo una entrada vencida
+        body_path, meta_path = self._paths(url)
+        meta = self._read_meta(meta_path)
+        if meta is None or not body_path.exists():
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def not_modified(self, url: str, headers: Optional[http.client.HTTPMessage] = None) -> Optional[Path]:
+        # La API respondió 304: el cuerpo guardado vuelve a estar vigente (y lo derivado de él)
+        body_path, meta_path = self._paths(url)
+        meta = self._read_meta(meta_path)
+        if meta is None or not body_path.exists():
+            return None
+        meta["stored_at"] = time.time()
+        meta.update(response_validators(headers))
+        self._replace(self._write_meta(meta_path, meta), meta_path)
+        try:
+            os.utime(body_path)
+        except OSError:
+            return None
+        with self._lock:
+            self.revalidated += 1
+        return body_path
+
+    def staging_path(self, url: str) -> Path:
+        body_path, _ = self._paths(url)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        return body_path.with_name(f"{body_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def commit(self, url: str, staged: Path, validators: Optional[Dict[str, str]] = None) -> None:
+        # Publica un cuerpo ya escrito en staging_path(url); lo derivado del anterior se descarta
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": normalize_url(url),
+            "stored_at": time.time(),
+            "size": staged.stat().st_size,
+            **(validators or {}),
+        }
+        tmp_meta = self._write_meta(meta_path, meta)
+        for derived in body_path.parent.glob(f"{body_path.name[: -len('.json')]}.*.derived"):
+            try:
+                size = derived.stat().st_size
+                derived.unlink()
+            except OSError:
+                continue
+            self._grow(-size)
+        self._replace(staged, body_path)
+        self._replace(tmp_meta, meta_path)
+        self.evict()
+
+    def put(self, url: str, body: bytes, validators: Optional[Dict[str, str]] = None) -> None:
+        staged = self.staging_path(url)
+        staged.write_bytes(body)
+        self.commit(url, staged, validators)
+
+    def get_derived(self, url: str, name: str) -> Optional[object]:
+        # Resultado guardado por put_derived; solo existe mientras el cuerpo no cambie
         try:
-            with urlopen(url, timeout=120) as resp:
-                return json.load(resp)
+            return json.loads(self._derived_path(url, name).read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def put_derived(self, url: str, name: str, value: object) -> None:
+        path = self._derived_path(url, name)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(value, default=to_json), encoding="utf-8")
+        self._replace(tmp, path)
+
+    def evict(self) -> None:
+        with self._lock:
+            # El directorio solo se recorre la primera vez o cuando el total llevado pasa el
+            # presupuesto; el recorrido corrige de paso lo que hayan escrito otros procesos
+            if self._size is not None and self._size <= self.max_bytes:
+                return
+            # Por entrada: mtime del cuerpo (último uso) y tamaño de todos sus archivos
+            entries: Dict[str, List] = {}
+            total = 0
+            for path in self.root.glob("*/*"):
+                if path.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                entry = entries.setdefault(path.name.split(".", 1)[0], [0.0, 0, []])
+                if path.name.endswith(".json") and not path.name.endswith(".meta.json"):
+                    entry[0] = st.st_mtime
+                entry[1] += st.st_size
+                entry[2].append(path)
+                total += st.st_size
+            if total > self.max_bytes:
+                target = self.max_bytes * self.EVICT_TO
+                for _, size, paths in sorted(entries.values(), key=lambda e: e[0]):
+                    if total <= target:
+                        break
+                    for path in paths:
+                        try:
+                            path.unlink()
+                        except OSError:
+                            pass
+                    total -= size
+            self._size = total
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated}
+
+
+# Se activa desde main() (--cache-dir); None = sin cache
+RESPONSE_CACHE: Optional[ResponseCache] = None
+
+
+class FixtureRecorder:
+    """Guarda cada respuesta de la API como fixture gzip, para reproducirla sin red."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        digest = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        return self.root / f"{digest}.json.gz", self.root / f"{digest}.meta.json"
+
+    def staging_path(self, url: str) -> Path:
+        body_path, _ = self._paths(url)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        return body_path.with_name(f"{body_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def commit(self, url: str, staged: Path) -> None:
+        body_path, meta_path = self._paths(url)
+        meta = {"url": normalize_url(url), "recorded_at": time.time()}
+        tmp_meta = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(staged, body_path)
+        os.replace(tmp_meta, meta_path)
+
+    def record(self, url: str, body: bytes) -> None:
+        staged = self.staging_path(url)
+        with gzip.open(staged, "wb") as f:
+            f.write(body)
+        self.commit(url, staged)
+
+    def record_file(self, url: str, src: BinaryIO) -> None:
+        staged = self.staging_path(url)
+        with gzip.open(staged, "wb") as f:
+            shutil.copyfileobj(src, f)
+        self.commit(url, staged)
+
+
+def iter_fixtures(root: Path) -> Iterator[Tuple[str, Path]]:
+    # (url normalizada, ruta del cuerpo gzip) de cada fixture grabado
+    for meta_path in sorted(root.glob("*.meta.json")):
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        body_path = meta_path.with_name(meta_path.name[: -len(".meta.json")] + ".json.gz")
+        if body_path.exists():
+            yield meta["url"], body_path
+
+
+# Se activa desde main() (--record-dir); None = no se graba
+FIXTURE_RECORDER: Optional[FixtureRecorder] = None
+
+
+class RateLimiter:
+    """Token bucket compartido entre hilos, con ajuste AIMD de la tasa."""
+
+    def __init__(
+        self,
+        rate: float = 4.0,
+        burst: int = 4,
+        max_rate: Optional[float] = None,
+        min_rate: float = 0.1,
+    ) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.min_rate = min(min_rate, rate)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._best_latency: Optional[float] = None
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        # 0 si se tomó un token; si no, segundos a esperar antes de reintentar
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            if self._best_latency is None or latency < self._best_latency:
+                self._best_latency = latency
+            # Latencia sana: sube ~0.5 req/s por segundo (sin importar la tasa actual);
+            # si se degrada, baja un poco.
+            if latency <= 2 * self._best_latency:
+                self.rate = min(self.max_rate, self.rate + 0.5 / self.rate)
+            else:
+                self.rate = max(self.min_rate, self.rate * 0.98)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Varias respuestas 429 simultáneas cuentan como una sola señal
+            if now - self._last_decrease >= 1.0:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._last_decrease = now
+            self._tokens = 0.0
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+
+# Se configura desde main() (--rate/--burst); None = sin límite
+RATE_LIMITER: Optional[RateLimiter] = None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# Estados HTTP que indican un problema pasajero del servidor (vale la pena reintentar)
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class FetchError(RuntimeError):
+    def __init__(self, url: str, attempts: int, cause: Optional[Exception]) -> None:
+        super().__init__(f"Error consultando API: {url} ({attempts} intentos)")
+        self.url = url
+        self.attempts = attempts
+        self.status = cause.code if isinstance(cause, HTTPError) else None
+
+
+class RetryPolicy:
+    """Reintentos con backoff exponencial y jitter completo."""
+
+    def __init__(self, retries: int = 3, base_delay: float = 1.0, max_delay: float = 30.0) -> None:
+        self.retries = max(1, retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        if isinstance(exc, HTTPError):
+            return exc.code in RETRYABLE_STATUS
+        if isinstance(exc, ssl.SSLCertVerificationError):
+            return False
+        # Red caída, timeouts, conexiones cortadas o cuerpos truncados (JSON incompleto)
+        return isinstance(exc, (OSError, EOFError, http.client.HTTPException, ValueError, zlib.error))
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """Pausa a todos los workers cuando se acumulan fallas seguidas (la API parece caída)."""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0, max_trips: int = 3) -> None:
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.max_trips = max_trips
+        self._failures = 0
+        self._trips = 0
+        self._opened_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        with self._lock:
+            if self._failures < self.threshold:
+                return 0.0
+            # Tras varias pausas sin una sola respuesta buena se aborta la corrida
+            if self._trips > self.max_trips:
+                raise CircuitOpenError(
+                    f"La API no responde tras {self._trips} pausas de {self.cooldown:.0f}s"
+                )
+            now = time.monotonic()
+            if now < self._opened_until:
+                return self._opened_until - now
+            # Semiabierto: pasa una sola petición de prueba, el resto espera su resultado
+            if not self._probing:
+                self._probing = True
+                return 0.0
+            return min(1.0, self.cooldown)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trips = 0
+            self._probing = False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures < self.threshold:
+                return
+            opening = time.monotonic() >= self._opened_until
+            if opening:
+                self._trips += 1
+            self._opened_until = time.monotonic() + self.cooldown
+        if opening:
+            print(
+                f"[WARN] {self._failures} fallas seguidas; pausa de {self.cooldown:.0f}s para todos",
+                file=sys.stderr,
+            )
+
+
+# Se configuran desde main() (--retries, --backoff-*, --breaker-*)
+RETRY_POLICY = RetryPolicy()
+CIRCUIT_BREAKER: Optional[CircuitBreaker] = CircuitBreaker()
+
+
+def is_throttle_error(exc: Exception) -> bool:
+    # 429 y cualquier 5xx: el servidor está saturado, no solo esta petición
+    return isinstance(exc, HTTPError) and (exc.code == 429 or exc.code >= 500)
+
+
+class RequestAttempts:
+    # Una petición lógica: espera del breaker/limitador, decisión de reintento y métricas
+    def __init__(self, url: str, policy: Optional[RetryPolicy] = None) -> None:
+        self.url = url
+        self.policy = policy or RETRY_POLICY
+        self.attempts = 0
+        self.latency: Optional[float] = None
+        self._started = time.monotonic()
+        self._attempt_started = self._started
+
+    def _breaker_wait(self) -> float:
+        return CIRCUIT_BREAKER.wait_time() if CIRCUIT_BREAKER is not None else 0.0
+
+    def before(self) -> None:
+        while (wait := self._breaker_wait()) > 0:
+            time.sleep(wait)
+        if RATE_LIMITER is not None:
+            RATE_LIMITER.acquire()
+        self.attempts += 1
+        self._attempt_started = time.monotonic()
+
+    async def before_async(self) -> None:
+        while (wait := self._breaker_wait()) > 0:
+            await asyncio.sleep(wait)
+        if RATE_LIMITER is not None:
+            await RATE_LIMITER.acquire_async()
+        self.attempts += 1
+        self._attempt_started = time.monotonic()
+
+    def responded(self) -> None:
+        self.latency = time.monotonic() - self._attempt_started
+        if RATE_LIMITER is not None:
+            RATE_LIMITER.on_success(self.latency)
+        if CIRCUIT_BREAKER is not None:
+            CIRCUIT_BREAKER.on_success()
+
+    def finished(self, decoder: BodyDecoder, outcome: str = "ok") -> None:
+        FETCH_METRICS.record(
+            self.url,
+            outcome,
+            attempts=self.attempts,
+            latency_s=self.latency,
+            elapsed_s=time.monotonic() - self._started,
+            encoding=decoder.encoding,
+            wire_bytes=decoder.wire_bytes,
+            body_bytes=decoder.body_bytes,
+        )
+
+    def failed(self, exc: Exception) -> Optional[float]:
+        # Segundos a esperar antes del siguiente intento, o None si hay que rendirse
+        retryable = self.policy.is_retryable(exc)
+        if CIRCUIT_BREAKER is not None:
+            # Un error no reintentable (p. ej. 404) significa que el servidor sí respondió
+            if retryable:
+                CIRCUIT_BREAKER.on_failure()
+            else:
+                CIRCUIT_BREAKER.on_success()
+
+        retry_after = None
+        if is_throttle_error(exc):
+            if exc.code in (429, 503):
+                retry_after = parse_retry_after(exc.headers.get("Retry-After"))
+            if RATE_LIMITER is not None:
+                # El limitador frena a todos los hilos (y respeta Retry-After)
+                RATE_LIMITER.on_throttle(retry_after)
+
+        if retryable and self.attempts < self.policy.retries:
+            return max(retry_after or 0.0, self.policy.backoff(self.attempts))
+
+        FETCH_METRICS.record(
+            self.url,
+            "error",
+            attempts=self.attempts,
+            elapsed_s=time.monotonic() - self._started,
+            error=f"{type(exc).__name__}: {exc}",
+        )
+        return None
+
+    def error(self, exc: Exception) -> FetchError:
+        return FetchError(self.url, self.attempts, exc)
+
+
+# (nombre, func, decode): func(payload) se guarda en la cache como JSON y decode rearma
+# ese valor al leerlo (None = tal cual)
+Deriver = Tuple[str, Callable[[dict], object], Optional[Callable[[object], object]]]
+
+
+def _load_derived(
+    cache: Optional[ResponseCache],
+    url: str,
+    body: bytes,
+    derive: Optional[Deriver],
+) -> object:
+    # Sin `derive`, el payload. Con él, el resultado guardado junto al cuerpo si existe:
+    # el cuerpo no cambió, así que no hace falta parsearlo ni derivarlo otra vez.
+    if derive is None:
+        return json.loads(body)
+    name, func, decode = derive
+    value = cache.get_derived(url, name) if cache is not None else None
+    if value is not None and decode is not None:
+        value = decode(value)
+    if value is None:
+        value = func(json.loads(body))
+        if cache is not None:
+            cache.put_derived(url, name, value)
+    return value
+
+
+def _fetch(
+    url: str,
+    policy: Optional[RetryPolicy] = None,
+    derive: Optional[Deriver] = None,
+) -> object:
+    cache = RESPONSE_CACHE
+    recorder = FIXTURE_RECORDER
+    headers: Dict[str, str] = {}
+    if cache is not None:
+        body = cache.get(url)
+        if body is not None:
+            FETCH_METRICS.record(url, "cache", body_bytes=len(body))
+            if recorder is not None:
+                recorder.record(url, body)
+            return _load_derived(cache, url, body, derive)
+        headers = cache.conditional_headers(url)
+
+    attempts = RequestAttempts(url, policy)
+    while True:
+        attempts.before()
+        try:
+            with HTTP_POOL.open(url, headers) as resp:
+                if resp.status == 304:
+                    resp.resp.read()
+                    body = b""
+                else:
+                    body = resp.read()
+            attempts.responded()
+            payload = json.loads(body) if resp.status != 304 else None
         except Exception as exc:  # pragma: no cover - runtime/network guard
-            last_error = exc
-            if attempt == retries:
+            delay = attempts.failed(exc)
+            if delay is None:
+                raise attempts.error(exc) from exc
+            time.sleep(delay)
+            continue
+
+        if resp.status == 304:
+            # Leer la entrada y derivar queda fuera del try: un error ahí (disco, aplanado)
+            # no es de red y no debe reintentarse ni contar para el circuit breaker
+            body_path = cache.not_modified(url, resp.headers) if cache is not None else None
+            if body_path is None:
+                # La entrada desapareció entre la consulta y la respuesta: petición normal
+                headers = {}
+                continue
+            body = body_path.read_bytes()
+            attempts.finished(resp.decoder, "not_modified")
+            if recorder is not None:
+                recorder.record(url, body)
+            return _load_derived(cache, url, body, derive)
+
+        attempts.finished(resp.decoder)
+        if cache is not None:
+            cache.put(url, body, response_validators(resp.headers))
+        if recorder is not None:
+            recorder.record(url, body)
+        if derive is None:
+            return payload
+        value = derive[1](payload)
+        if cache is not None:
+            cache.put_derived(url, derive[0], value)
+        return value
+
+
+def fetch_json(url: str, policy: Optional[RetryPolicy] = None) -> dict:
+    return _fetch(url, policy)
+
+
+def fetch_derived(
+    url: str,
+    name: str,
+    func: Callable[[dict], object],
+    decode: Optional[Callable[[object], object]] = None,
+    policy: Optional[RetryPolicy] = None,
+) -> object:
+    # func(fetch_json(url)), guardado en la cache junto a la respuesta bajo `name`. Si la
+    # respuesta sigue vigente o la API contesta 304, se reutiliza (pasado por `decode`)
+    # sin parsear ni derivar.
+    return _fetch(url, policy, (name, func, decode))
+
+
+JSON_DELIMITERS = frozenset(",]} \t\r\n")
+
+
+class _JsonStreamScanner:
+    # Lee JSON por bloques y decodifica valores completos con raw_decode
+    def __init__(self, stream: BinaryIO, chunk_size: int = 1 << 16) -> None:
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self) -> bool:
+        if self.eof:
+            return False
+        data = self.stream.read(self.chunk_size)
+        if data:
+            text = self.utf8.decode(data)
+        else:
+            self.eof = True
+            text = self.utf8.decode(b"", final=True)
+        self.buf = self.buf[self.pos :] + text
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"JSON inválido: se esperaba {ch!r} en la posición {self.pos}")
+        self.pos += 1
+
+    def value(self) -> object:
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+                # Un número cortado entre bloques ("1" de "1.5") decodifica igual: solo vale
+                # si lo que sigue es un separador o ya no hay más datos. Textos, objetos y
+                # listas terminan en su propio cierre y se aceptan en cuanto decodifican
+                if (
+                    self.eof
+                    or not isinstance(obj, (int, float))
+                    or isinstance(obj, bool)
+                    or (end < len(self.buf) and self.buf[end] in JSON_DELIMITERS)
+                ):
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._more()
+
+
+def iter_json_array(stream: BinaryIO, key: str, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    # Emite uno a uno los elementos de payload[key] sin cargar el documento completo
+    scanner = _JsonStreamScanner(stream, chunk_size)
+    scanner.expect("{")
+    while True:
+        ch = scanner.peek()
+        if ch == "}":
+            scanner.pos += 1
+            return
+        if ch == ",":
+            scanner.pos += 1
+            continue
+        if ch == "":
+            raise ValueError("JSON truncado")
+        name = scanner.value()
+        scanner.expect(":")
+        if name != key or scanner.peek() != "[":
+            scanner.value()
+            continue
+        scanner.pos += 1
+        while True:
+            ch = scanner.peek()
+            if ch == "]":
+                scanner.pos += 1
                 break
-            time.sleep(sleep_seconds * attempt)
-    raise RuntimeError(f"Error consultando API: {url}") from last_error
+            if ch == ",":
+                scanner.pos += 1
+                continue
+            if ch == "":
+                raise ValueError("JSON truncado")
+            yield scanner.value()
+
+
+class _TeeReader:
+    # Copia a `sinks` todo lo que se lee de `stream` (cache/fixtures sin bufferizar)
+    def __init__(self, stream: BinaryIO, sinks: List[BinaryIO]) -> None:
+        self.stream = stream
+        self.sinks = sinks
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        if data:
+            for sink in self.sinks:
+                sink.write(data)
+        return data
+
+
+def fetch_json_stream(
+    url: str,
+    key: str = "transactions",
+    policy: Optional[RetryPolicy] = None,
+) -> Iterator[dict]:
+    # Versión en streaming de fetch_json(url)[key]. Si la conexión falla a media respuesta,
+    # se repite la petición y se omiten los elementos ya emitidos.
+    cache = RESPONSE_CACHE
+    recorder = FIXTURE_RECORDER
+    if cache is not None:
+        cached = cache.open(url)
+        if cached is not None:
+            with cached:
+                if recorder is not None:
+                    recorder.record_file(url, cached)
+                    cached.seek(0)
+                yield from iter_json_array(cached, key)
+                FETCH_METRICS.record(url, "cache", body_bytes=cached.tell())
+            return
+    headers = cache.conditional_headers(url) if cache is not None else {}
+
+    attempts = RequestAttempts(url, policy)
+    emitted = 0
+    while True:
+        staged = cache.staging_path(url) if cache is not None else None
+        recorded = recorder.staging_path(url) if recorder is not None else None
+        attempts.before()
+        try:
+            body_path: Optional[Path] = None
+            with HTTP_POOL.open(url, headers) as resp, ExitStack() as sinks:
+                attempts.responded()
+                if resp.status == 304:
+                    resp.resp.read()
+                    body_path = cache.not_modified(url, resp.headers) if cache is not None else None
+                    if body_path is None:
+                        headers = {}
+                        continue
+                else:
+                    outputs: List[BinaryIO] = []
+                    if staged is not None:
+                        outputs.append(sinks.enter_context(staged.open("wb")))
+                    if recorded is not None:
+                        outputs.append(sinks.enter_context(gzip.open(recorded, "wb")))
+                    source = _TeeReader(resp, outputs) if outputs else resp
+                    for i, item in enumerate(iter_json_array(source, key)):
+                        if i >= emitted:
+                            emitted += 1
+                            yield item
+                    while source.read(1 << 16):
+                        pass
+            if body_path is not None:
+                # 304: se lee el cuerpo guardado, ya con la conexión devuelta al pool
+                attempts.finished(resp.decoder, "not_modified")
+                with body_path.open("rb") as cached:
+                    if recorder is not None:
+                        recorder.record_file(url, cached)
+                        cached.seek(0)
+                    for i, item in enumerate(iter_json_array(cached, key)):
+                        if i >= emitted:
+                            emitted += 1
+                            yield item
+                return
+            attempts.finished(resp.decoder)
+            if cache is not None and staged is not None:
+                cache.commit(url, staged, response_validators(resp.headers))
+            if recorder is not None and recorded is not None:
+                recorder.commit(url, recorded)
+            return
+        except Exception as exc:  # pragma: no cover - runtime/network guard
+            delay = attempts.failed(exc)
+            if delay is None:
+                raise attempts.error(exc) from exc
+            time.sleep(delay)
+        finally:
+            for path in (staged, recorded):
+                if path is not None and path.exists():
+                    path.unlink()
+
+
+def sport_label(sport_id: int) -> str:
+    return SPORT_LABELS.get(sport_id, f"sport{sport_id}")
 
 
 def build_url(start_date: str, end_date: str, sport_id: int = 1) -> str:
@@ -117,6 +1385,676 @@ def build_url(start_date: str, end_date: str, sport_id: int = 1) -> str:
     return f"{BASE_URL}?{urlencode(params)}"
 
 
+def split_range(start: date, end: date, chunk: str = "year") -> List[Tuple[date, date]]:
+    # chunk: "year" (una petición por año), "month" o un número de días por ventana
+    windows: List[Tuple[date, date]] = []
+    if chunk in ("year", "month"):
+        cur = start
+        while cur <= end:
+            if chunk == "year":
+                nxt = date(cur.year + 1, 1, 1)
+            elif cur.month == 12:
+                nxt = date(cur.year + 1, 1, 1)
+            else:
+                nxt = date(cur.year, cur.month + 1, 1)
+            last = min(nxt - timedelta(days=1), end)
+            windows.append((cur, last))
+            cur = nxt
+        return windows
+
+    days = int(chunk)
+    if days < 1:
+        raise ValueError(f"chunk inválido: {chunk}")
+    cur = start
+    while cur <= end:
+        last = min(cur + timedelta(days=days - 1), end)
+        windows.append((cur, last))
+        cur = last + timedelta(days=1)
+    return windows
+
+
+def split_year(year: int, chunk: str = "year") -> List[Tuple[date, date]]:
+    return split_range(date(year, 1, 1), date(year, 12, 31), chunk)
+
+
+def fetch_window(start: date, end: date, sport_id: int = 1) -> List[dict]:
+    url = build_url(start.isoformat(), end.isoformat(), sport_id=sport_id)
+    payload = fetch_json(url)
+    return payload.get("transactions", [])
+
+
+def to_json(value: object) -> object:
+    # json.dumps(default=...) para lo que guarda put_derived
+    if isinstance(value, TransactionColumns):
+        return value.to_json()
+    raise TypeError(f"{type(value).__name__} no se puede guardar como JSON")
+
+
+def from_json(value: object) -> object:
+    # Inverso de to_json para lo que devuelve get_derived
+    if isinstance(value, dict) and "desc_offsets" in value:
+        return TransactionColumns.from_json(value)
+    return value
+
+
+def window_deriver(transform: Callable[[Iterable[dict]], object]) -> Deriver:
+    # Nombre con la versión del script: si cambia la lógica de aplanado, no se reutiliza
+    return (
+        f"{transform.__name__}-{SCRIPT_VERSION}",
+        lambda payload: transform(payload.get("transactions", [])),
+        from_json,
+    )
+
+
+def checkpointed_deriver(
+    transform: Callable[[Iterable[dict]], object],
+    checkpoint_dir: Optional[Path],
+    start: date,
+    end: date,
+    sport_id: int = 1,
+) -> Deriver:
+    # window_deriver que además guarda la ventana en --checkpoint-dir cuando se descarga (o
+    # cambió): el checkpoint no vence con --cache-ttl ni lo desaloja el LRU
+    name, derive, decode = window_deriver(transform)
+
+    def derive_and_checkpoint(payload: dict) -> object:
+        save_checkpoint(checkpoint_dir, start, end, payload.get("transactions", []), sport_id)
+        return derive(payload)
+
+    return name, derive_and_checkpoint, decode
+
+
+def iter_window_transactions(start: date, end: date, sport_id: int = 1) -> Iterator[dict]:
+    url = build_url(start.isoformat(), end.isoformat(), sport_id=sport_id)
+    return fetch_json_stream(url, "transactions")
+
+
+def transaction_key(tx: dict) -> Tuple[object, ...]:
+    # Una transacción con varios jugadores llega como varias entradas con el mismo id
+    return (
+        tx.get("id"),
+        safe_get(tx.get("person"), "id"),
+        tx.get("date"),
+        tx.get("effectiveDate"),
+        tx.get("resolutionDate"),
+    )
+
+
+def stitch_windows(
+    chunks: List[List[dict]],
+    key_func: Callable[[dict], Tuple[object, ...]] = transaction_key,
+) -> List[dict]:
+    # Solo se descartan repetidos que ya venían en una ventana anterior (bordes);
+    # dentro de una misma ventana se conserva lo que devuelve la API.
+    seen: set = set()
+    out: List[dict] = []
+    for txs in chunks:
+        keys = []
+        for tx in txs:
+            key = key_func(tx)
+            keys.append(key)
+            if key not in seen:
+                out.append(tx)
+        seen.update(keys)
+    return out
+
+
+def drop_seen(chunk: "TransactionColumns", seen: set) -> "TransactionColumns":
+    # Un paso de stitch_columns: quita de `chunk` lo que ya venía en ventanas anteriores
+    keys = list(chunk.row_keys())
+    keep = [i for i, key in enumerate(keys) if key not in seen]
+    seen.update(keys)
+    return chunk if len(keep) == len(keys) else chunk.take(keep)
+
+
+def stitch_columns(chunks: Iterable["TransactionColumns"]) -> "TransactionColumns":
+    # stitch_windows para ventanas ya aplanadas (clave equivalente a transaction_key)
+    seen: set = set()
+    out = TransactionColumns()
+    for chunk in chunks:
+        out.extend_columns(drop_seen(chunk, seen))
+    return out
+
+
+def checkpoint_path(checkpoint_dir: Path, start: date, end: date, sport_id: int = 1) -> Path:
+    return checkpoint_dir / f"sport{sport_id}_{start.isoformat()}_{end.isoformat()}.json"
+
+
+def load_checkpoint(
+    checkpoint_dir: Optional[Path], start: date, end: date, sport_id: int = 1
+) -> Optional[List[dict]]:
+    if checkpoint_dir is None:
+        return None
+    path = checkpoint_path(checkpoint_dir, start, end, sport_id)
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None  # no existe o quedó incompleto: se vuelve a descargar
+
+
+def checkpoint_tee(
+    checkpoint_dir: Optional[Path],
+    start: date,
+    end: date,
+    txs: Iterable[dict],
+    sport_id: int = 1,
+) -> Iterator[dict]:
+    # Escribe el checkpoint a medida que se consumen las transacciones;
+    # solo se publica si la ventana se recorrió completa.
+    if checkpoint_dir is None:
+        yield from txs
+        return
+    path = checkpoint_path(checkpoint_dir, start, end, sport_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write("[")
+            for i, tx in enumerate(txs):
+                if i:
+                    f.write(",")
+                f.write(json.dumps(tx))
+                yield tx
+            f.write("]")
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def save_checkpoint(
+    checkpoint_dir: Optional[Path], start: date, end: date, txs: List[dict], sport_id: int = 1
+) -> None:
+    for _ in checkpoint_tee(checkpoint_dir, start, end, txs, sport_id):
+        pass
+
+
+def fetch_window_checkpointed(
+    start: date,
+    end: date,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    transform: Optional[Callable[[Iterable[dict]], object]] = None,
+    stream: bool = False,
+    sport_id: int = 1,
+) -> object:
+    txs: Optional[Iterable[dict]] = (
+        load_checkpoint(checkpoint_dir, start, end, sport_id) if resume else None
+    )
+    if txs is None and stream:
+        # Cada transacción pasa a `transform` en cuanto se decodifica
+        txs = checkpoint_tee(
+            checkpoint_dir, start, end, iter_window_transactions(start, end, sport_id), sport_id
+        )
+    elif txs is None and transform is not None and RESPONSE_CACHE is not None:
+        # La respuesta en cache hace de checkpoint; sus filas ya derivadas se reutilizan
+        # mientras la API no informe cambios (entrada vigente o 304)
+        url = build_url(start.isoformat(), end.isoformat(), sport_id=sport_id)
+        return fetch_derived(
+            url, *checkpointed_deriver(transform, checkpoint_dir, start, end, sport_id)
+        )
+    elif txs is None:
+        txs = fetch_window(start, end, sport_id)
+        save_checkpoint(checkpoint_dir, start, end, txs, sport_id)
+    return transform(txs) if transform is not None else list(txs)
+
+
+def clear_checkpoints(
+    checkpoint_dir: Optional[Path], windows: List[Tuple[date, date]], sport_id: int = 1
+) -> None:
+    if checkpoint_dir is None:
+        return
+    for start, end in windows:
+        try:
+            checkpoint_path(checkpoint_dir, start, end, sport_id).unlink()
+        except OSError:
+            pass
+
+
+def fetch_windows(
+    windows: List[Tuple[date, date]],
+    workers: int = 1,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    transform: Optional[Callable[[Iterable[dict]], object]] = None,
+    engine: str = "threads",
+    stream: bool = False,
+    sport_id: int = 1,
+) -> List[object]:
+    # Resultados en el mismo orden que `windows`. Cada ventana terminada se guarda en
+    # checkpoint_dir; si otra falla, las ya descargadas quedan disponibles para --resume.
+    # `transform` (p. ej. flatten_window) se aplica a cada ventana en cuanto llega; con
+    # stream=True (solo motor de hilos) recibe las transacciones conforme se decodifican.
+    # El ritmo de peticiones lo controla RATE_LIMITER, tanto en modo secuencial como en paralelo.
+    if engine == "async":
+        return fetch_windows_async(
+            windows,
+            concurrency=workers,
+            checkpoint_dir=checkpoint_dir,
+            resume=resume,
+            transform=transform,
+            sport_id=sport_id,
+        )
+
+    if workers <= 1:
+        return [
+            fetch_window_checkpointed(start, end, checkpoint_dir, resume, transform, stream, sport_id)
+            for start, end in windows
+        ]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                fetch_window_checkpointed,
+                start,
+                end,
+                checkpoint_dir,
+                resume,
+                transform,
+                stream,
+                sport_id,
+            )
+            for start, end in windows
+        ]
+        return [fut.result() for fut in futures]
+
+
+def iter_windows(
+    windows: List[Tuple[date, date]],
+    workers: int = 1,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    transform: Optional[Callable[[Iterable[dict]], object]] = None,
+    engine: str = "threads",
+    stream: bool = False,
+    sport_id: int = 1,
+) -> Iterator[object]:
+    # Como fetch_windows, pero entrega cada ventana en orden en cuanto está lista, con como
+    # mucho 2 * workers descargadas o en vuelo: la memoria no crece con el rango pedido
+    lookahead = 2 * max(1, workers)
+    if engine == "async":
+        yield from iter_windows_async(
+            windows,
+            concurrency=workers,
+            checkpoint_dir=checkpoint_dir,
+            resume=resume,
+            transform=transform,
+            sport_id=sport_id,
+            lookahead=lookahead,
+        )
+        return
+
+    if workers <= 1:
+        for start, end in windows:
+            yield fetch_window_checkpointed(
+                start, end, checkpoint_dir, resume, transform, stream, sport_id
+            )
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque[Future] = deque()
+        for start, end in windows:
+            pending.append(
+                pool.submit(
+                    fetch_window_checkpointed,
+                    start,
+                    end,
+                    checkpoint_dir,
+                    resume,
+                    transform,
+                    stream,
+                    sport_id,
+                )
+            )
+            if len(pending) >= lookahead:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_years(
+    years: List[int],
+    workers: int = 1,
+    chunk: str = "year",
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    engine: str = "threads",
+    stream: bool = False,
+    sport_id: int = 1,
+) -> Iterator["TransactionColumns"]:
+    # Ventanas ya aplanadas (flatten_window), en orden y sin los repetidos de borde dentro
+    # de cada año
+    windows = [(year, w) for year in years for w in split_year(year, chunk)]
+    label = sport_label(sport_id)
+    print(
+        f"[INFO] {label}: descargando {years[0]}-{years[-1]} ({len(windows)} peticiones)...",
+        file=sys.stderr,
+    )
+    results = iter_windows(
+        [w for _, w in windows],
+        workers=workers,
+        checkpoint_dir=checkpoint_dir,
+        resume=resume,
+        transform=flatten_window,
+        engine=engine,
+        stream=stream,
+        sport_id=sport_id,
+    )
+
+    current: Optional[int] = None
+    seen: set = set()
+    count = 0
+    for (year, _), rows in zip(windows, results):
+        if year != current:
+            if current is not None:
+                print(f"[INFO] {label} {current}: {count} transacciones", file=sys.stderr)
+            current, seen, count = year, set(), 0
+        rows = drop_seen(rows, seen)
+        count += len(rows)
+        yield rows
+    if current is not None:
+        print(f"[INFO] {label} {current}: {count} transacciones", file=sys.stderr)
+
+
+class AsyncHttpClient:
+    """Cliente HTTP/1.1 mínimo sobre asyncio, con conexiones keep-alive reutilizables."""
+
+    def __init__(self, max_connections: int = 64, timeout: float = 120) -> None:
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._idle: Dict[Tuple[str, str], List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _connect(self, scheme: str, netloc: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        host, _, port = netloc.rpartition(":") if ":" in netloc else (netloc, "", "")
+        default_port = 443 if scheme == "https" else 80
+        ssl_ctx = ssl.create_default_context() if scheme == "https" else None
+        return await asyncio.open_connection(
+            host,
+            int(port) if port else default_port,
+            ssl=ssl_ctx,
+            server_hostname=host if ssl_ctx else None,
+        )
+
+    @staticmethod
+    async def _roundtrip(
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        netloc: str,
+        path: str,
+        headers: Dict[str, str],
+    ) -> Tuple[int, str, http.client.HTTPMessage, bytes, bool, BodyDecoder]:
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {netloc}",
+            "Connection: keep-alive",
+            f"Accept-Encoding: {ACCEPT_ENCODING}",
+        ]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+        status_line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+        if not status_line:
+            raise ConnectionResetError("conexión cerrada por el servidor")
+        version, status, *reason = status_line.split(" ", 2)
+        resp_headers = http.client.HTTPMessage()
+        while True:
+            line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            resp_headers[name.strip()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and resp_headers.get("Connection", "").lower() != "close"
+        # Se descomprime conforme llegan los bloques, sin juntar el cuerpo comprimido
+        decoder = BodyDecoder(resp_headers.get("Content-Encoding"))
+        parts = []
+        if int(status) in (204, 304):
+            pass  # sin cuerpo
+        elif resp_headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                parts.append(decoder.feed(await reader.readexactly(size)))
+                await reader.readline()
+        elif resp_headers.get("Content-Length") is not None:
+            remaining = int(resp_headers["Content-Length"])
+            while remaining > 0:
+                data = await reader.readexactly(min(remaining, 1 << 16))
+                remaining -= len(data)
+                parts.append(decoder.feed(data))
+        else:
+            while True:
+                data = await reader.read(1 << 16)
+                if not data:
+                    break
+                parts.append(decoder.feed(data))
+            keep_alive = False
+        parts.append(decoder.flush())
+        body = b"".join(parts)
+        return int(status), (reason[0] if reason else ""), resp_headers, body, keep_alive, decoder
+
+    async def get(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, http.client.HTTPMessage, bytes, BodyDecoder]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        async with self._slots:
+            idle = self._idle.setdefault(key, [])
+            conn = idle.pop() if idle else None
+            reused = conn is not None
+            if conn is None:
+                conn = await self._connect(*key)
+            try:
+                result = await asyncio.wait_for(
+                    self._roundtrip(*conn, parts.netloc, path, headers or {}), self.timeout
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Conexión ociosa cerrada por el servidor: se reintenta una vez
+                conn[1].close()
+                if not reused:
+                    raise
+                conn = await self._connect(*key)
+                result = await asyncio.wait_for(
+                    self._roundtrip(*conn, parts.netloc, path, headers or {}), self.timeout
+                )
+            except BaseException:
+                conn[1].close()
+                raise
+
+            status, reason, resp_headers, body, keep_alive, decoder = result
+            if keep_alive:
+                idle.append(conn)
+            else:
+                conn[1].close()
+            if status >= 400:
+                raise HTTPError(url, status, reason, resp_headers, None)
+            return status, resp_headers, body, decoder
+
+    async def close(self) -> None:
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+
+async def fetch_json_async(
+    client: AsyncHttpClient,
+    url: str,
+    policy: Optional[RetryPolicy] = None,
+    derive: Optional[Deriver] = None,
+) -> object:
+    # Mismo contrato que fetch_json/fetch_derived (cache, 304, limitador, reintentos),
+    # sin bloquear el loop: derivar (p. ej. flatten_window, que puede esperar al pool de
+    # --cpu-workers) corre en el executor del loop mientras siguen las demás descargas
+    loop = asyncio.get_running_loop()
+    cache = RESPONSE_CACHE
+    recorder = FIXTURE_RECORDER
+    headers: Dict[str, str] = {}
+    if cache is not None:
+        body = cache.get(url)
+        if body is not None:
+            FETCH_METRICS.record(url, "cache", body_bytes=len(body))
+            if recorder is not None:
+                recorder.record(url, body)
+            return await loop.run_in_executor(None, _load_derived, cache, url, body, derive)
+        headers = cache.conditional_headers(url)
+
+    attempts = RequestAttempts(url, policy)
+    while True:
+        await attempts.before_async()
+        try:
+            status, resp_headers, body, decoder = await client.get(url, headers)
+            attempts.responded()
+            payload = json.loads(body) if status != 304 else None
+        except Exception as exc:  # pragma: no cover - runtime/network guard
+            delay = attempts.failed(exc)
+            if delay is None:
+                raise attempts.error(exc) from exc
+            await asyncio.sleep(delay)
+            continue
+
+        if status == 304:
+            # Como en _fetch: la entrada y la derivación se manejan fuera del try
+            body_path = cache.not_modified(url, resp_headers) if cache is not None else None
+            if body_path is None:
+                headers = {}
+                continue
+            body = body_path.read_bytes()
+            attempts.finished(decoder, "not_modified")
+            if recorder is not None:
+                recorder.record(url, body)
+            return await loop.run_in_executor(None, _load_derived, cache, url, body, derive)
+
+        attempts.finished(decoder)
+        if cache is not None:
+            cache.put(url, body, response_validators(resp_headers))
+        if recorder is not None:
+            recorder.record(url, body)
+        if derive is None:
+            return payload
+        value = await loop.run_in_executor(None, derive[1], payload)
+        if cache is not None:
+            cache.put_derived(url, derive[0], value)
+        return value
+
+
+async def fetch_window_async(
+    client: AsyncHttpClient,
+    start: date,
+    end: date,
+    checkpoint_dir: Optional[Path],
+    resume: bool,
+    transform: Optional[Callable[[Iterable[dict]], object]],
+    sport_id: int = 1,
+) -> object:
+    # fetch_window_checkpointed para el motor async
+    txs = load_checkpoint(checkpoint_dir, start, end, sport_id) if resume else None
+    url = build_url(start.isoformat(), end.isoformat(), sport_id=sport_id)
+    if txs is None and transform is not None and RESPONSE_CACHE is not None:
+        return await fetch_json_async(
+            client,
+            url,
+            derive=checkpointed_deriver(transform, checkpoint_dir, start, end, sport_id),
+        )
+    if txs is None:
+        txs = (await fetch_json_async(client, url)).get("transactions", [])
+        save_checkpoint(checkpoint_dir, start, end, txs, sport_id)
+    if transform is None:
+        return txs
+    return await asyncio.get_running_loop().run_in_executor(None, transform, txs)
+
+
+async def _fetch_windows_async(
+    windows: List[Tuple[date, date]],
+    concurrency: int,
+    checkpoint_dir: Optional[Path],
+    resume: bool,
+    transform: Optional[Callable[[Iterable[dict]], object]],
+    sport_id: int = 1,
+) -> List[object]:
+    client = AsyncHttpClient(max_connections=concurrency)
+    try:
+        return list(
+            await asyncio.gather(
+                *(
+                    fetch_window_async(client, start, end, checkpoint_dir, resume, transform, sport_id)
+                    for start, end in windows
+                )
+            )
+        )
+    finally:
+        await client.close()
+
+
+def fetch_windows_async(
+    windows: List[Tuple[date, date]],
+    concurrency: int = 64,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    transform: Optional[Callable[[Iterable[dict]], object]] = None,
+    sport_id: int = 1,
+) -> List[object]:
+    return asyncio.run(
+        _fetch_windows_async(windows, concurrency, checkpoint_dir, resume, transform, sport_id)
+    )
+
+
+async def _cancel_pending(client: AsyncHttpClient) -> None:
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await client.close()
+
+
+def iter_windows_async(
+    windows: List[Tuple[date, date]],
+    concurrency: int = 64,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    transform: Optional[Callable[[Iterable[dict]], object]] = None,
+    sport_id: int = 1,
+    lookahead: Optional[int] = None,
+) -> Iterator[object]:
+    # Un solo loop y un solo AsyncHttpClient (conexiones keep-alive) en un hilo aparte para
+    # toda la corrida; se agendan hasta `lookahead` ventanas por delante y se entregan en orden
+    lookahead = lookahead or 2 * concurrency
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="fetch-async", daemon=True)
+    thread.start()
+    client = AsyncHttpClient(max_connections=concurrency)
+    pending: deque[Future] = deque()
+    try:
+        for start, end in windows:
+            pending.append(
+                asyncio.run_coroutine_threadsafe(
+                    fetch_window_async(client, start, end, checkpoint_dir, resume, transform, sport_id),
+                    loop,
+                )
+            )
+            if len(pending) >= lookahead:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # También si el consumidor corta o una ventana falla: se cancela lo que quede en vuelo
+        asyncio.run_coroutine_threadsafe(_cancel_pending(client), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
 def safe_get(obj: Optional[dict], key: str) -> Optional[str]:
     if not isinstance(obj, dict):
         return None
@@ -129,7 +2067,8 @@ def choose_event_date(tx: dict) -> Optional[str]:
     return tx.get("date") or tx.get("effectiveDate") or tx.get("resolutionDate")
 
 
-def classify_injury(description: str) -> Dict[str, object]:
+def classify_injury_reference(description: str) -> Dict[str, object]:
+    # Versión original, una búsqueda por regex; las demás deben dar exactamente lo mismo
     text = (description or "").strip()
     lower = text.lower()
 
@@ -178,32 +2117,570 @@ def classify_injury(description: str) -> Dict[str, object]:
     }
 
 
-def flatten_transaction(tx: dict) -> Dict[str, object]:
+def classify_injury_fused(description: str) -> Dict[str, object]:
+    text = (description or "").strip()
+    lower = text.lower()
+
+    keywords = KEYWORD_SCAN_RE.findall(lower)
+    is_injury_related = bool(keywords)
+    is_covid_il = "covid-19 injured list" in keywords
+
+    # Cada cadena avanza con la primera pieza que le sirve (como el .*? de la regex);
+    # "." no cruza saltos de línea, así que las cadenas se evalúan por línea. Todas las
+    # cadenas y el bucket por días terminan en "injured/disabled list": en texto ASCII sin
+    # palabras clave no hay nada que buscar (con otros alfabetos IGNORECASE y lower() difieren).
+    found = dict.fromkeys(CLASSIFY_CHAINS, False)
+    is_rehab_assignment = False
+    days = None
+    lines = text.split("\n") if "\n" in text else (text,)
+    for line in lines if keywords or not text.isascii() else ():
+        progress = dict.fromkeys(CLASSIFY_CHAINS, 0)
+        for match in CLASSIFY_TOKEN_RE.finditer(line):
+            kind = match.lastgroup
+            if kind == "rehab":
+                is_rehab_assignment = True
+                continue
+            if kind == "list" and days is None and match.group("days"):
+                days = match.group("days")
+            for flag, chain in CLASSIFY_CHAINS.items():
+                step = progress[flag]
+                if step < len(chain) and chain[step] == kind:
+                    progress[flag] = step + 1
+                    if step + 1 == len(chain):
+                        found[flag] = True
+
+    is_il_placement = found["is_il_placement"]
+    is_il_transfer = found["is_il_transfer"]
+    is_il_activation = found["is_il_activation"]
+    count_as_new_injury_registration = is_il_placement and not is_il_transfer
+
+    if is_il_transfer:
+        injury_event_type = "il_transfer"
+    elif is_il_placement:
+        injury_event_type = "il_placement"
+    elif is_il_activation:
+        injury_event_type = "il_activation"
+    elif is_rehab_assignment:
+        injury_event_type = "rehab_assignment"
+    elif is_injury_related:
+        injury_event_type = "injury_other"
+    else:
+        injury_event_type = "non_injury"
+
+    il_days_bucket = None
+    if days is not None:
+        il_days_bucket = f"{days}-day"
+    elif is_covid_il:
+        il_days_bucket = "covid-19"
+    elif "concussion injured list" in keywords or "concussion disabled list" in keywords:
+        il_days_bucket = "concussion"
+
+    return {
+        "is_injury_related": int(is_injury_related),
+        "injury_event_type": injury_event_type,
+        "is_il_placement": int(is_il_placement),
+        "is_il_activation": int(is_il_activation),
+        "is_il_transfer": int(is_il_transfer),
+        "is_rehab_assignment": int(is_rehab_assignment),
+        "is_covid_il": int(is_covid_il),
+        "il_days_bucket": il_days_bucket,
+        "count_as_new_injury_registration": int(count_as_new_injury_registration),
+    }
+
+
+NON_INJURY_FLAGS = classify_injury_fused("")
+
+
+def may_be_injury(description: Optional[str]) -> bool:
+    # False garantiza el resultado de NON_INJURY_FLAGS: en texto ASCII sin palabras clave
+    # classify_injury_fused no tiene ninguna pieza que buscar
+    if not description:
+        return False
+    if not description.isascii():
+        return True
+    lower = description.lower()
+    for term in PREFILTER_TERMS:
+        if term in lower:
+            return True
+    return False
+
+
+# Palabra -> ¿puede aportar a la clasificación? (se conserva en la plantilla)
+_TEMPLATE_WORDS: Dict[str, bool] = {}
+
+
+def _is_template_word(word: str) -> bool:
+    if word.split() != [word]:
+        return True  # vacía o con otros espacios (saltos de línea): se deja tal cual
+    return bool(TEMPLATE_TOKEN_WORD_RE.search(word) or TEMPLATE_KEYWORD_WORD_RE.search(word.lower()))
+
+
+def injury_template(description: str) -> str:
+    # "Texas Rangers placed RHP Josh Sborz on the 15-day injured list. Right elbow."
+    #   -> "# # placed # # # on the 15-day injured list. # # #"
+    # Equipos, jugadores, fechas y motivos se enmascaran palabra por palabra.
+    words = _TEMPLATE_WORDS
+    if len(words) > TEMPLATE_WORDS_MAX:
+        words.clear()
+    out = []
+    for word in (description or "").strip().split(" "):
+        keep = words.get(word)
+        if keep is None:
+            keep = words[word] = _is_template_word(word)
+        out.append(word if keep else "#")
+    return " ".join(out)
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def _classify_template(template: str) -> Dict[str, object]:
+    return classify_injury_fused(template)
+
+
+def classify_injury(description: str) -> Dict[str, object]:
+    # Misma salida que classify_injury_reference, memorizada por plantilla (LRU acotado);
+    # lo que no pasa el prefiltro ni se convierte en plantilla: sale directo como NON_INJURY_FLAGS
+    if CLASSIFY_PREFILTER and not may_be_injury(description):
+        return dict(NON_INJURY_FLAGS)
+    return dict(_classify_template(injury_template(description)))
+
+
+def classify_cache_stats() -> Dict[str, float]:
+    info = _classify_template.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "templates": info.currsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
+
+
+def classify_templates(
+    descriptions: Iterable[Optional[str]],
+) -> Tuple[List[int], List[Dict[str, object]]]:
+    # (código por descripción, resultado por plantilla distinta): cada plantilla se
+    # clasifica una sola vez; results[codes[i]] es la clasificación de descriptions[i]
+    index: Dict[str, int] = {}
+    codes: List[int] = []
+    prefilter = CLASSIFY_PREFILTER
+    for description in descriptions:
+        if not isinstance(description, str):
+            description = ""  # None, o NaN/<NA> de una columna de pandas con vacíos
+        if prefilter and not may_be_injury(description):
+            template = ""  # misma clasificación que NON_INJURY_FLAGS
+        else:
+            template = injury_template(description)
+        code = index.get(template)
+        if code is None:
+            code = index[template] = len(index)
+        codes.append(code)
+    return codes, [_classify_template(template) for template in index]
+
+
+def classify_many(
+    descriptions: Iterable[Optional[str]],
+    as_numpy: Optional[bool] = None,
+) -> Dict[str, object]:
+    # Clasifica una columna completa (lista, Series de pandas, array...). Devuelve
+    # {campo de classify_injury: columna}, como arrays de NumPy si está disponible
+    # (as_numpy=None) o como listas.
+    codes, results = classify_templates(descriptions)
+
+    if as_numpy is None:
+        as_numpy = np is not None
+    if as_numpy and np is None:
+        raise RuntimeError("classify_many(as_numpy=True) requiere numpy")
+    columns: Dict[str, object] = {}
+    if as_numpy:
+        taken = np.asarray(codes, dtype=np.intp)
+        for name in CLASSIFY_COLUMNS:
+            dtype = object if name in CLASSIFY_TEXT_COLUMNS else np.uint8
+            values = np.empty(len(results), dtype=dtype)
+            values[:] = [r[name] for r in results]
+            columns[name] = values[taken]
+    else:
+        for name in CLASSIFY_COLUMNS:
+            values = [r[name] for r in results]
+            columns[name] = [values[code] for code in codes]
+    return columns
+
+
+def flatten_transaction(tx: dict, flags: Optional[Dict[str, object]] = None) -> TransactionRow:
     description = tx.get("description") or ""
     event_date = choose_event_date(tx)
     year = None
     if event_date:
         year = int(event_date[:4])
 
-    flags = classify_injury(description)
-    return {
-        "transaction_id": tx.get("id"),
-        "api_date": tx.get("date"),
-        "effective_date": tx.get("effectiveDate"),
-        "resolution_date": tx.get("resolutionDate"),
-        "event_date": event_date,
-        "year": year,
-        "type_code": tx.get("typeCode"),
-        "type_desc": tx.get("typeDesc"),
-        "description": description,
-        "person_id": safe_get(tx.get("person"), "id"),
-        "person_name": safe_get(tx.get("person"), "fullName"),
-        "from_team_id": safe_get(tx.get("fromTeam"), "id"),
-        "from_team_name": safe_get(tx.get("fromTeam"), "name"),
-        "to_team_id": safe_get(tx.get("toTeam"), "id"),
-        "to_team_name": safe_get(tx.get("toTeam"), "name"),
-        **flags,
-    }
+    if flags is None:
+        flags = classify_injury(description)
+    person, from_team, to_team = tx.get("person"), tx.get("fromTeam"), tx.get("toTeam")
+    return TransactionRow._make(
+        (
+            tx.get("id"),
+            tx.get("date"),
+            tx.get("effectiveDate"),
+            tx.get("resolutionDate"),
+            event_date,
+            year,
+            tx.get("typeCode"),
+            tx.get("typeDesc"),
+            description,
+            safe_get(person, "id"),
+            safe_get(person, "fullName"),
+            safe_get(from_team, "id"),
+            safe_get(from_team, "name"),
+            safe_get(to_team, "id"),
+            safe_get(to_team, "name"),
+            *CLASSIFY_VALUES(flags),
+        )
+    )
+
+
+# Pool de procesos para aplanar/clasificar (--cpu-workers); None = en el propio proceso
+CPU_POOL: Optional[ProcessPoolExecutor] = None
+CPU_WORKERS = 1
+
+
+def flatten_batch(batch: List[dict]) -> List[TransactionRow]:
+    # Cada plantilla se clasifica una vez por lote
+    codes, results = classify_templates(tx.get("description") for tx in batch)
+    return [flatten_transaction(tx, results[code]) for tx, code in zip(batch, codes)]
+
+
+def flatten_batch_columns(batch: List[dict]) -> "TransactionColumns":
+    # Para CPU_POOL: las columnas viajan entre procesos mucho más livianas que las tuplas
+    return TransactionColumns.from_rows(flatten_batch(batch))
+
+
+def flatten_window(txs: Iterable[dict]) -> "TransactionColumns":
+    # Por lotes (acota la memoria con --stream); las tuplas de cada lote pasan a columnas y
+    # se liberan. Con CPU_POOL cada lote va a un proceso y se recoge en orden de envío:
+    # misma salida que en serie, con como mucho dos lotes por proceso en vuelo
+    out = TransactionColumns()
+    it = iter(txs)
+    pool = CPU_POOL
+    if pool is None:
+        while batch := list(islice(it, FLATTEN_BATCH_SIZE)):
+            out.extend(flatten_batch(batch))
+        return out
+    pending: deque[Future] = deque()
+    while batch := list(islice(it, FLATTEN_BATCH_SIZE)):
+        pending.append(pool.submit(flatten_batch_columns, batch))
+        if len(pending) >= 2 * CPU_WORKERS:
+            out.extend_columns(pending.popleft().result())
+    while pending:
+        out.extend_columns(pending.popleft().result())
+    return out
+
+
+class TransactionColumns:
+    """Transacciones aplanadas por columnas: enteros en array('q'), textos repetidos (fechas,
+    equipos, tipos, nombres) como códigos de diccionario y descripciones como offsets + bytes
+    UTF-8. Ocupa una fracción de las tuplas y se puede agregar sin recorrer filas."""
+
+    def __init__(self) -> None:
+        self.ints: Dict[str, array] = {name: array(INT_TYPECODES[name]) for name in INT_COLUMNS}
+        self.codes: Dict[str, array] = {name: array("i") for name in CODED_COLUMNS}
+        # valor -> código; el código 0 siempre es None
+        self.dictionaries: Dict[str, Dict[Optional[str], int]] = {
+            name: {None: 0} for name in CODED_COLUMNS
+        }
+        self.desc_offsets = array("q", [0])
+        self.desc_bytes = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.desc_offsets) - 1
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[TransactionRow]) -> "TransactionColumns":
+        columns = cls()
+        columns.extend(rows)
+        return columns
+
+    def extend(self, rows: Iterable[TransactionRow]) -> None:
+        # Por lotes y por columna (zip(*lote)): el trabajo por valor queda en C (fromlist
+        # es el camino rápido de array; extend con tuplas o iteradores va elemento a elemento)
+        it = iter(rows)
+        while batch := list(islice(it, FLATTEN_BATCH_SIZE)):
+            for name, values in zip(INJURY_COLUMNS, zip(*batch)):
+                if name in self.ints:
+                    if None in values:
+                        null = NULL_INT if INT_TYPECODES[name] == "q" else 0
+                        self.ints[name].fromlist([null if v is None else v for v in values])
+                    else:
+                        self.ints[name].fromlist(list(values))
+                elif name in self.codes:
+                    index = self.dictionaries[name]
+                    new = [v for v in dict.fromkeys(values) if v not in index]
+                    index.update(zip(new, range(len(index), len(index) + len(new))))
+                    self.codes[name].fromlist(list(map(index.__getitem__, values)))
+                else:
+                    encoded = [(v or "").encode("utf-8") for v in values]
+                    end = self.desc_offsets[-1]
+                    self.desc_offsets.fromlist(list(accumulate(map(len, encoded), initial=end))[1:])
+                    self.desc_bytes += b"".join(encoded)
+
+    def extend_columns(self, other: "TransactionColumns") -> None:
+        # Agrega otro TransactionColumns, recodificando contra los diccionarios propios
+        for name, column in other.ints.items():
+            self.ints[name].extend(column)
+        for name, codes in other.codes.items():
+            index = self.dictionaries[name]
+            if other.dictionaries[name] is index:
+                self.codes[name].extend(codes)
+                continue
+            translate = [
+                index[v] if v in index else index.setdefault(v, len(index))
+                for v in other.dictionaries[name]
+            ]
+            self.codes[name].fromlist(list(map(translate.__getitem__, codes)))
+        end = self.desc_offsets[-1]
+        self.desc_offsets.fromlist([end + offset for offset in islice(other.desc_offsets, 1, None)])
+        self.desc_bytes += other.desc_bytes
+
+    def to_json(self) -> dict:
+        return {
+            "ints": {name: column.tolist() for name, column in self.ints.items()},
+            "codes": {name: column.tolist() for name, column in self.codes.items()},
+            "dictionaries": {name: list(index) for name, index in self.dictionaries.items()},
+            "desc_offsets": self.desc_offsets.tolist(),
+            "descriptions": self.desc_bytes.decode("utf-8"),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "TransactionColumns":
+        columns = cls()
+        for name in INT_COLUMNS:
+            columns.ints[name] = array(INT_TYPECODES[name], data["ints"][name])
+        for name in CODED_COLUMNS:
+            columns.codes[name] = array("i", data["codes"][name])
+            columns.dictionaries[name] = {v: i for i, v in enumerate(data["dictionaries"][name])}
+        columns.desc_offsets = array("q", data["desc_offsets"])
+        columns.desc_bytes = bytearray(data["descriptions"].encode("utf-8"))
+        return columns
+
+    def values(self, name: str) -> Iterator[object]:
+        # Columna decodificada, valor por valor (None donde la fila no tenía dato)
+        if name in self.ints:
+            column = self.ints[name]
+            if column.typecode == "B" or NULL_INT not in column:
+                return iter(column)
+            return (None if v == NULL_INT else v for v in column)
+        if name in self.codes:
+            return map(list(self.dictionaries[name]).__getitem__, self.codes[name])
+        offsets, data = self.desc_offsets, self.desc_bytes
+        return (data[a:b].decode("utf-8") for a, b in zip(offsets, islice(offsets, 1, None)))
+
+    def iter_values(self, names: List[str]) -> Iterator[Tuple[object, ...]]:
+        return zip(*(self.values(name) for name in names))
+
+    def csv_values(self, schema: Dict[str, str]) -> Iterator[Tuple[object, ...]]:
+        # iter_values con el formato de CSV_FORMATS (fechas ISO); en las columnas codificadas
+        # se formatea una vez por valor del diccionario, no por fila. Los enteros ya vienen
+        # tipados desde los arrays
+        streams: List[Iterable[object]] = []
+        for name, kind in schema.items():
+            fmt = CSV_FORMATS.get(kind)
+            if name in self.codes and fmt is not None:
+                lookup = [v if v is None else fmt(v) for v in self.dictionaries[name]]
+                streams.append(map(lookup.__getitem__, self.codes[name]))
+            else:
+                streams.append(self.values(name))
+        return zip(*streams)
+
+    def rows(self) -> Iterator[TransactionRow]:
+        return map(TransactionRow._make, self.iter_values(INJURY_COLUMNS))
+
+    def row_keys(self) -> Iterator[Tuple[object, ...]]:
+        # Equivalente a transaction_key para filas ya aplanadas
+        return self.iter_values(
+            ["transaction_id", "person_id", "api_date", "effective_date", "resolution_date"]
+        )
+
+    def take(self, indices: List[int]) -> "TransactionColumns":
+        # Subconjunto/reordenamiento de filas; comparte los diccionarios
+        out = TransactionColumns()
+        out.dictionaries = self.dictionaries
+        gather = _gatherer(indices)
+        for name, column in self.ints.items():
+            out.ints[name] = array(column.typecode, gather(column))
+        for name, column in self.codes.items():
+            out.codes[name] = array("i", gather(column))
+        offsets, data = self.desc_offsets, self.desc_bytes
+        parts = [data[offsets[i] : offsets[i + 1]] for i in indices]
+        out.desc_offsets.fromlist(list(accumulate(map(len, parts))))
+        out.desc_bytes = bytearray(b"".join(parts))
+        return out
+
+    def sort_order(self) -> List[int]:
+        # Mismo orden (estable) que sort(key=(event_date or "", transaction_id or 0)) sobre filas
+        event_keys = [value or "" for value in self.dictionaries["event_date"]]
+        position = {key: i for i, key in enumerate(sorted(set(event_keys)))}
+        rank = [position[key] for key in event_keys]
+        ids = [0 if v == NULL_INT else v for v in self.ints["transaction_id"]]
+        keys = list(zip(map(rank.__getitem__, self.codes["event_date"]), ids))
+        return sorted(range(len(keys)), key=keys.__getitem__)
+
+    def where(self, name: str, value: int) -> List[int]:
+        return [i for i, v in enumerate(self.ints[name]) if v == value]
+
+    def total(self, name: str) -> int:
+        return sum(v for v in self.ints[name] if v != NULL_INT)
+
+    def sums_by(self, key: str, names: List[str]) -> Dict[Optional[str], Dict[str, int]]:
+        # {valor de `key`: {columna: suma}} para las filas con ese valor (con NumPy si está)
+        codes = self.codes[key]
+        size = len(self.dictionaries[key])
+        totals: Dict[str, List[int]] = {}
+        if np is not None:
+            taken = np.frombuffer(codes, dtype=np.int32) if len(codes) else np.zeros(0, np.int32)
+            totals["rows"] = np.bincount(taken, minlength=size).tolist()
+            for name in names:
+                column = self.ints[name]
+                column = np.frombuffer(column, dtype=column.typecode) if len(codes) else np.zeros(0, np.int64)
+                if column.dtype == np.int64:
+                    column = np.where(column == NULL_INT, 0, column)
+                totals[name] = np.bincount(taken, weights=column, minlength=size).astype(np.int64).tolist()
+        else:
+            totals["rows"] = [0] * size
+            for code in codes:
+                totals["rows"][code] += 1
+            for name in names:
+                sums = totals[name] = [0] * size
+                for code, v in zip(codes, self.ints[name]):
+                    if v != NULL_INT:
+                        sums[code] += v
+        return {
+            value: {name: totals[name][code] for name in totals}
+            for value, code in self.dictionaries[key].items()
+            if totals["rows"][code]
+        }
+
+
+def _gatherer(indices: List[int]) -> Callable[[array], Iterable[int]]:
+    # column -> column[i] para cada i, con itemgetter (en C); con un solo índice no da tupla
+    if len(indices) < 2:
+        return lambda column: [column[i] for i in indices]
+    return itemgetter(*indices)
+
+
+class ColumnsFileWriter:
+    """Formato compacto en disco de TransactionColumns (gzip): un encabezado y luego bloques
+    con los arrays tal cual están en memoria. Cada bloque trae solo los valores de diccionario
+    nuevos, así que un código vale lo mismo en todo el archivo."""
+
+    def __init__(self, f: BinaryIO) -> None:
+        self._f = f
+        self.dictionaries: Dict[str, Dict[Optional[str], int]] = {
+            name: {None: 0} for name in CODED_COLUMNS
+        }
+        self._write_record(
+            {
+                "format": COLUMNS_FORMAT,
+                "version": COLUMNS_FORMAT_VERSION,
+                "byteorder": sys.byteorder,
+                "ints": INT_TYPECODES,
+                "codes": CODED_COLUMNS,
+            },
+            [],
+        )
+
+    def write(self, chunk: TransactionColumns) -> None:
+        known = {name: len(index) for name, index in self.dictionaries.items()}
+        # Recodifica contra los diccionarios del archivo (que crecen con cada bloque)
+        shared = TransactionColumns()
+        shared.dictionaries = self.dictionaries
+        shared.extend_columns(chunk)
+        header = {
+            "rows": len(shared),
+            "dictionaries": {
+                name: list(islice(index, known[name], None))
+                for name, index in self.dictionaries.items()
+                if len(index) > known[name]
+            },
+            "desc_bytes": len(shared.desc_bytes),
+        }
+        self._write_record(
+            header,
+            [*shared.ints.values(), *shared.codes.values(), shared.desc_offsets, shared.desc_bytes],
+        )
+
+    def _write_record(self, header: dict, buffers: List[object]) -> None:
+        data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        self._f.write(len(data).to_bytes(4, "little"))
+        self._f.write(data)
+        for buffer in buffers:
+            self._f.write(buffer)
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("archivo de columnas truncado")
+    return data
+
+
+def _read_array(f: BinaryIO, typecode: str, count: int, swap: bool) -> array:
+    column = array(typecode)
+    column.frombytes(_read_exact(f, count * column.itemsize))
+    if swap:
+        column.byteswap()
+    return column
+
+
+def iter_columns_file(path: Path) -> Iterator[TransactionColumns]:
+    # Lee lo que escribe ColumnsFileWriter, bloque por bloque; todos los bloques comparten
+    # los mismos diccionarios (agrupar por equipo o jugador es trabajo sobre enteros)
+    with gzip.open(path, "rb") as f:
+        size = f.read(4)
+        header = json.loads(_read_exact(f, int.from_bytes(size, "little"))) if size else {}
+        if header.get("format") != COLUMNS_FORMAT or header.get("version") != COLUMNS_FORMAT_VERSION:
+            raise ValueError(f"{path} no es un archivo de columnas compatible")
+        if header["ints"] != INT_TYPECODES or header["codes"] != CODED_COLUMNS:
+            raise ValueError(f"{path} tiene otras columnas")
+        swap = header["byteorder"] != sys.byteorder
+        dictionaries = {name: {None: 0} for name in CODED_COLUMNS}
+        while size := f.read(4):
+            block = json.loads(_read_exact(f, int.from_bytes(size, "little")))
+            for name, values in block["dictionaries"].items():
+                index = dictionaries[name]
+                index.update(zip(values, range(len(index), len(index) + len(values))))
+            n = block["rows"]
+            chunk = TransactionColumns()
+            chunk.dictionaries = dictionaries
+            for name in INT_COLUMNS:
+                chunk.ints[name] = _read_array(f, INT_TYPECODES[name], n, swap)
+            for name in CODED_COLUMNS:
+                chunk.codes[name] = _read_array(f, "i", n, swap)
+            chunk.desc_offsets = _read_array(f, "q", n + 1, swap)
+            chunk.desc_bytes = bytearray(_read_exact(f, block["desc_bytes"]))
+            yield chunk
+
+
+def read_columns_file(path: Path) -> TransactionColumns:
+    columns = TransactionColumns()
+    for chunk in iter_columns_file(path):
+        if not len(columns):
+            columns.dictionaries = chunk.dictionaries
+        columns.extend_columns(chunk)
+    return columns
+
+
+def columns_path(raw_path: Path) -> Path:
+    # mlb_transactions_flat_2015_2025.csv -> mlb_transactions_flat_2015_2025.cols.gz
+    return raw_path.with_suffix(".cols.gz")
+
+
+def output_paths(outdir: Path, start_year: int, end_year: int, sport_id: int = 1) -> Tuple[Path, Path, Path]:
+    # MLB conserva los nombres de siempre; cada otro nivel va con sufijo _sport{id}
+    suffix = "" if sport_id == 1 else f"_sport{sport_id}"
+    span = f"{start_year}_{end_year}{suffix}"
+    return (
+        outdir / f"mlb_transactions_flat_{span}.csv",
+        outdir / f"mlb_injury_transactions_{span}.csv",
+        outdir / f"mlb_injuries_daily_{span}.csv",
+    )
 
 
 def daterange(start: date, end: date) -> Iterable[date]:
@@ -213,33 +2690,226 @@ def daterange(start: date, end: date) -> Iterable[date]:
         cur += timedelta(days=1)
 
 
-def write_csv(path: Path, rows: List[Dict[str, object]], columns: List[str]) -> None:
+def write_csv(path: Path, rows: Iterable[object], schema: Dict[str, str]) -> None:
+    # Filas como dicts (faltantes -> vacío), tuplas con nombre (TransactionRow) o un
+    # TransactionColumns completo: mismo formato que csv.DictWriter, sin un dict por fila.
+    # En los tres casos los valores salen según el esquema (enteros sin ".0", fechas ISO),
+    # para que los loaders no tengan que adivinar tipos
+    columns = list(schema)
     path.parent.mkdir(parents=True, exist_ok=True)
     with path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=columns)
-        writer.writeheader()
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        if isinstance(rows, TransactionColumns):
+            writer.writerows(rows.csv_values(schema))
+            return
+        formats = [CSV_FORMATS.get(kind) for kind in schema.values()]
+        values = attrgetter(*columns)
         for row in rows:
-            writer.writerow({k: row.get(k) for k in columns})
+            raw = [row.get(k) for k in columns] if isinstance(row, dict) else values(row)
+            writer.writerow(
+                [v if v is None or fmt is None else fmt(v) for v, fmt in zip(raw, formats)]
+            )
+
+
+class FlatCsvSink:
+    """Escribe el CSV flat y el de lesiones a medida que llegan los chunks, y lleva los conteos diarios."""
+
+    def __init__(
+        self, raw_path: Path, injury_path: Path, daily_path: Path, columnar: bool = False
+    ) -> None:
+        self.paths = [raw_path, injury_path, daily_path]
+        # Con --columnar, además el flat en formato compacto (ColumnsFileWriter)
+        self.columns_path = columns_path(raw_path) if columnar else None
+        self._columns: Optional[ColumnsFileWriter] = None
+        self.rows = 0
+        self.injury_rows = 0
+        self.registrations = 0
+        self.out_of_order = 0
+        self.by_day: Dict[str, Counter] = {}
+        self._last: Optional[Tuple[str, int]] = None
+        self._stack = ExitStack()
+        self._writers: list = []
 
+    def _tmp(self, path: Path) -> Path:
+        # Se escribe al lado y se renombra al final: una corrida que falla no deja un CSV a
+        # medias, y --incremental puede seguir leyendo el archivo anterior mientras tanto
+        return path.with_name(path.name + ".tmp")
+
+    def __enter__(self) -> "FlatCsvSink":
+        for path, schema in zip(self.paths[:2], (RAW_SCHEMA, INJURY_SCHEMA)):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            f = self._stack.enter_context(self._tmp(path).open("w", newline="", encoding="utf-8"))
+            writer = csv.writer(f)
+            writer.writerow(list(schema))
+            self._writers.append(writer)
+        if self.columns_path is not None:
+            f = self._stack.enter_context(gzip.open(self._tmp(self.columns_path), "wb", compresslevel=6))
+            self._columns = ColumnsFileWriter(f)
+        return self
+
+    def write(self, chunk: TransactionColumns) -> None:
+        # Cada chunk llega ordenado; entre chunks se confía en el orden de la API y solo se
+        # cuenta el chunk que empiece antes de donde terminó el anterior
+        if not len(chunk):
+            return
+        first, last = (
+            (event_date or "", transaction_id or 0)
+            for event_date, transaction_id in chunk.take([0, len(chunk) - 1]).iter_values(
+                ["event_date", "transaction_id"]
+            )
+        )
+        if self._last is not None and first < self._last:
+            self.out_of_order += 1
+        self._last = last
+
+        raw_writer, injury_writer = self._writers
+        raw_writer.writerows(chunk.csv_values(RAW_SCHEMA))
+        if self._columns is not None:
+            self._columns.write(chunk)
+        injury = chunk.take(chunk.where("is_injury_related", 1))
+        injury_writer.writerows(injury.csv_values(INJURY_SCHEMA))
+        add_daily_counts(self.by_day, injury)
+        self.rows += len(chunk)
+        self.injury_rows += len(injury)
+        self.registrations += injury.total("count_as_new_injury_registration")
+
+    def finish(self, start_date: date, end_date: date) -> None:
+        self._stack.close()
+        raw_path, injury_path, daily_path = self.paths
+        write_csv(daily_path, daily_series(self.by_day, start_date, end_date), DAILY_SCHEMA)
+        os.replace(self._tmp(raw_path), raw_path)
+        os.replace(self._tmp(injury_path), injury_path)
+        if self.columns_path is not None:
+            # --incremental solo usa el compacto si no es más viejo que el CSV
+            os.replace(self._tmp(self.columns_path), self.columns_path)
+            os.utime(self.columns_path)
+            self.paths.append(self.columns_path)
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        self._stack.close()
+        for path in [*self.paths[:2], self.columns_path]:
+            if path is not None:
+                self._tmp(path).unlink(missing_ok=True)
+
+
+def read_flat_csv(path: Path) -> List[TransactionRow]:
+    return list(iter_flat_csv(path))
+
+
+def iter_flat_csv(path: Path) -> Iterator[TransactionRow]:
+    # Tipos según RAW_SCHEMA; acepta CSV viejos con ids como float ("623406.0") y sin
+    # alguna bandera (se lee como 0)
+    with path.open("r", newline="", encoding="utf-8") as f:
+        for raw in csv.DictReader(f):
+            row: Dict[str, object] = {}
+            for k, kind in RAW_SCHEMA.items():
+                v = raw.get(k)
+                if v in (None, ""):
+                    row[k] = 0 if kind == "flag" else None
+                elif kind in INT_KINDS:
+                    row[k] = int(float(v))
+                else:
+                    row[k] = v
+            row["count_as_new_injury_registration"] = int(
+                bool(row["is_il_placement"]) and not row["is_il_transfer"]
+            )
+            yield TransactionRow(**row)
+
+
+def load_frame(path: Path, schema: Dict[str, str] = RAW_SCHEMA) -> "pd.DataFrame":
+    # Un CSV de este script en pandas con los tipos del esquema (RAW_SCHEMA, INJURY_SCHEMA o
+    # DAILY_SCHEMA): sin inferencia ni columnas object; ids Int64 con <NA>, fechas
+    # datetime64, banderas uint8, textos repetidos como category. Como iter_flat_csv, acepta
+    # CSV viejos: columnas en otro orden, ids como float y banderas ausentes (quedan en 0)
+    if pd is None:
+        raise RuntimeError("load_frame requiere pandas")
+    with path.open("r", newline="", encoding="utf-8") as f:
+        header = set(next(csv.reader(f), []))
+    present = {name: kind for name, kind in schema.items() if name in header}
+    missing = [name for name in schema if name not in header]
+    required = [name for name in missing if schema[name] == "int"]
+    if required:
+        raise ValueError(f"{path} no tiene las columnas {', '.join(required)}")
+
+    frame = pd.read_csv(
+        path,
+        usecols=list(present),
+        dtype={name: PANDAS_DTYPES[kind] for name, kind in present.items() if kind != "date"},
+        parse_dates=[name for name, kind in present.items() if kind == "date"],
+        date_format="%Y-%m-%d",
+        keep_default_na=False,
+        na_values=[""],
+    )
+    # Las fechas que falten, con la misma unidad que las leídas (depende de la versión)
+    date_dtype = next(
+        (frame[name].dtype for name, kind in present.items() if kind == "date"), "datetime64[ns]"
+    )
+    for name in missing:
+        kind = schema[name]
+        if kind == "flag":
+            frame[name] = pd.Series(0, index=frame.index, dtype="uint8")
+        elif kind == "date":
+            frame[name] = pd.Series(pd.NaT, index=frame.index, dtype=date_dtype)
+        elif kind == "category":
+            frame[name] = pd.Series(pd.NA, index=frame.index, dtype="string").astype("category")
+        else:
+            frame[name] = pd.Series(pd.NA, index=frame.index, dtype=PANDAS_DTYPES[kind])
+    return frame[list(schema)]
 
-def build_daily_series(
-    injury_rows: List[Dict[str, object]],
-    start_date: date,
-    end_date: date,
-) -> List[Dict[str, object]]:
-    by_day: Dict[str, Counter] = {}
-    for row in injury_rows:
-        d = row.get("event_date")
+
+def iter_column_batches(rows: Iterable[TransactionRow]) -> Iterator[TransactionColumns]:
+    it = iter(rows)
+    while batch := list(islice(it, FLATTEN_BATCH_SIZE)):
+        yield TransactionColumns.from_rows(batch)
+
+
+def merge_incremental(
+    existing: Iterable[TransactionColumns],
+    fresh: TransactionColumns,
+    window_start: str,
+) -> Iterator[TransactionColumns]:
+    # Lo descargado reemplaza todo lo que ya había desde window_start y, antes de esa
+    # fecha, cualquier fila con el mismo (transaction_id, person_id) (ediciones tardías).
+    # Lo conservado (event_date < window_start) sale antes que lo nuevo, en el mismo orden.
+    key_names = ["transaction_id", "person_id"]
+    fresh_keys = set(fresh.iter_values(key_names))
+    for chunk in existing:
+        kept = [
+            i
+            for i, (event_date, key) in enumerate(
+                zip(chunk.values("event_date"), chunk.iter_values(key_names))
+            )
+            if (event_date or "") < window_start and key not in fresh_keys
+        ]
+        if kept:
+            yield chunk.take(kept)
+    yield fresh
+
+
+def add_daily_counts(by_day: Dict[str, Counter], injury_rows: Iterable[TransactionRow]) -> None:
+    # Suma las filas de lesión por event_date (sobre columnas; otras filas se convierten)
+    if not isinstance(injury_rows, TransactionColumns):
+        injury_rows = TransactionColumns.from_rows(injury_rows)
+    sums = injury_rows.sums_by(
+        "event_date",
+        ["count_as_new_injury_registration", "is_il_activation", "is_il_transfer", "is_rehab_assignment"],
+    )
+    for d, day in sums.items():
         if not d:
             continue
-        if d not in by_day:
-            by_day[d] = Counter()
-        by_day[d]["injury_related_transactions"] += 1
-        by_day[d]["injury_registrations"] += int(row.get("count_as_new_injury_registration", 0) or 0)
-        by_day[d]["il_activations"] += int(row.get("is_il_activation", 0) or 0)
-        by_day[d]["il_transfers"] += int(row.get("is_il_transfer", 0) or 0)
-        by_day[d]["rehab_assignments"] += int(row.get("is_rehab_assignment", 0) or 0)
+        by_day.setdefault(d, Counter()).update(
+            {
+                "injury_related_transactions": day["rows"],
+                "injury_registrations": day["count_as_new_injury_registration"],
+                "il_activations": day["is_il_activation"],
+                "il_transfers": day["is_il_transfer"],
+                "rehab_assignments": day["is_rehab_assignment"],
+            }
+        )
+
 
+def daily_series(by_day: Dict[str, Counter], start_date: date, end_date: date) -> List[Dict[str, object]]:
     rows: List[Dict[str, object]] = []
     for d in daterange(start_date, end_date):
         key = d.isoformat()
@@ -263,58 +2933,368 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--start-year", type=int, default=2015)
     p.add_argument("--end-year", type=int, default=2025)
     p.add_argument("--outdir", type=Path, default=Path("data"))
-    p.add_argument("--sleep", type=float, default=0.25, help="Pausa entre años")
+    p.add_argument(
+        "--sleep",
+        type=float,
+        default=None,
+        help="Obsoleto: equivale a --rate 1/SLEEP --burst 1",
+    )
+    p.add_argument("--rate", type=float, default=4.0, help="Peticiones por segundo (inicial)")
+    p.add_argument("--burst", type=int, default=4, help="Peticiones permitidas de golpe")
+    p.add_argument(
+        "--max-rate",
+        type=float,
+        default=None,
+        help="Tasa máxima a la que puede subir el limitador (default: 2 x --rate)",
+    )
+    p.add_argument(
+        "--sports",
+        default="1",
+        help="sportId separados por coma (1=MLB, 11=AAA, 12=AA, 13=A+, 14=A); un juego de CSV por nivel",
+    )
+    p.add_argument(
+        "--cpu-workers",
+        type=int,
+        default=1,
+        help="Procesos para aplanar y clasificar (útil en backfills grandes; 1 = sin pool)",
+    )
+    p.add_argument(
+        "--sport-workers",
+        type=int,
+        default=2,
+        help="Niveles descargados a la vez con --sports (acota la memoria)",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Peticiones en paralelo (1 = secuencial); con --engine async, peticiones en vuelo",
+    )
+    p.add_argument(
+        "--engine",
+        choices=["threads", "async"],
+        default="threads",
+        help="Motor de descarga: hilos (http.client) o asyncio en un solo hilo",
+    )
+    p.add_argument(
+        "--stream",
+        action="store_true",
+        help="Decodifica cada respuesta transacción por transacción (solo --engine threads)",
+    )
+    p.add_argument(
+        "--chunk",
+        default="year",
+        help='Tamaño de ventana por petición: "year", "month" o número de días',
+    )
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Actualiza los CSV existentes descargando solo desde la última fecha registrada",
+    )
+    p.add_argument(
+        "--overlap-days",
+        type=int,
+        default=3,
+        help="Días hacia atrás desde la última fecha que se vuelven a descargar (--incremental)",
+    )
+    p.add_argument(
+        "--checkpoint-dir",
+        type=Path,
+        default=Path(".cache/checkpoints"),
+        help="Directorio donde se guarda cada ventana descargada hasta terminar la corrida",
+    )
+    p.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reutiliza las ventanas ya guardadas en --checkpoint-dir",
+    )
+    p.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=Path(".cache/mlb_api"),
+        help="Directorio del cache de respuestas de la API",
+    )
+    p.add_argument("--retries", type=int, default=3, help="Intentos máximos por petición")
+    p.add_argument(
+        "--backoff-base",
+        type=float,
+        default=1.0,
+        help="Espera base del backoff exponencial (segundos, con jitter)",
+    )
+    p.add_argument("--backoff-max", type=float, default=30.0, help="Espera máxima entre intentos")
+    p.add_argument(
+        "--breaker-threshold",
+        type=int,
+        default=5,
+        help="Fallas seguidas que pausan todas las descargas (0 = sin circuit breaker)",
+    )
+    p.add_argument(
+        "--breaker-cooldown",
+        type=float,
+        default=30.0,
+        help="Segundos de pausa cuando se abre el circuit breaker",
+    )
+    p.add_argument(
+        "--api-root",
+        default=API_ROOT,
+        help="Raíz de la API (p. ej. el servidor local de scripts/mlb_api_stub.py)",
+    )
+    p.add_argument(
+        "--record-dir",
+        type=Path,
+        default=None,
+        help="Graba cada respuesta como fixture gzip en este directorio",
+    )
+    p.add_argument(
+        "--metrics-out",
+        type=Path,
+        default=None,
+        help="CSV con métricas por petición (bytes en la red vs. descomprimidos)",
+    )
+    p.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Escribe también el flat como .cols.gz (códigos + diccionarios; --incremental lo lee si existe)",
+    )
+    p.add_argument("--no-cache", action="store_true", help="Desactiva el cache en disco")
+    p.add_argument("--cache-max-mb", type=float, default=512, help="Tamaño máximo del cache (LRU)")
+    p.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=3600,
+        help="Vigencia en segundos de respuestas de la temporada actual",
+    )
+    p.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="Confirma con la API (ETag/Last-Modified, 304) todo lo cacheado, incluso temporadas cerradas",
+    )
     return p.parse_args()
 
 
+def existing_chunks(raw_path: Path) -> Callable[[], Iterator[TransactionColumns]]:
+    # Para --incremental: el archivo compacto si está al día con el CSV (no hay que
+    # reconvertir texto a enteros), si no el CSV por lotes
+    path = columns_path(raw_path)
+    if path.exists() and path.stat().st_mtime >= raw_path.stat().st_mtime:
+        try:
+            for _ in iter_columns_file(path):
+                break
+            return lambda: iter_columns_file(path)
+        except (OSError, ValueError) as exc:
+            print(f"[WARN] No se usa {path}: {exc}", file=sys.stderr)
+    return lambda: iter_column_batches(iter_flat_csv(raw_path))
+
+
+def run_sport(
+    args: argparse.Namespace, sport_id: int, start_date: date, end_date: date
+) -> Dict[str, object]:
+    # Descarga, aplana y escribe un nivel completo; al volver, sus filas ya se pueden liberar
+    raw_path, injury_path, daily_path = output_paths(
+        args.outdir, args.start_year, args.end_year, sport_id
+    )
+    label = sport_label(sport_id)
+
+    windows: List[Tuple[date, date]] = []
+    if args.incremental:
+        if not raw_path.exists():
+            raise SystemExit(f"No existe {raw_path}; corre primero sin --incremental")
+        # Primera pasada solo por la última fecha; el archivo se relee por partes al escribir
+        existing = existing_chunks(raw_path)
+        watermark = max(
+            (d for chunk in existing() for d in chunk.dictionaries["event_date"] if d), default=None
+        )
+        if watermark is None:
+            window_start = start_date
+        else:
+            window_start = max(
+                start_date,
+                date.fromisoformat(str(watermark)) - timedelta(days=args.overlap_days),
+            )
+        window_end = min(end_date, date.today())
+        fresh = TransactionColumns()
+        if window_start <= window_end:
+            print(
+                f"[INFO] {label} incremental: {window_start} a {window_end} (última fecha: {watermark})",
+                file=sys.stderr,
+            )
+            windows = split_range(window_start, window_end, args.chunk)
+            chunks = fetch_windows(
+                windows,
+                workers=args.workers,
+                checkpoint_dir=args.checkpoint_dir,
+                resume=args.resume,
+                transform=flatten_window,
+                engine=args.engine,
+                stream=args.stream,
+                sport_id=sport_id,
+            )
+            # Solo lo nuevo queda completo en memoria (unos días), para cruzar las claves
+            fresh = stitch_columns(chunks)
+            fresh = fresh.take(fresh.sort_order())
+            print(
+                f"[INFO] {label} incremental: {len(fresh)} transacciones descargadas",
+                file=sys.stderr,
+            )
+        chunks = merge_incremental(existing(), fresh, window_start.isoformat())
+    else:
+        years = list(range(args.start_year, args.end_year + 1))
+        windows = [w for year in years for w in split_year(year, args.chunk)]
+        # Orden por fecha/evento y id para trazabilidad: la API ya filtra cada ventana por
+        # fecha y las ventanas salen en orden, así que basta ordenar dentro de cada una
+        chunks = (
+            rows.take(rows.sort_order())
+            for rows in iter_years(
+                years,
+                workers=args.workers,
+                chunk=args.chunk,
+                checkpoint_dir=args.checkpoint_dir,
+                resume=args.resume,
+                engine=args.engine,
+                stream=args.stream,
+                sport_id=sport_id,
+            )
+        )
+
+    with FlatCsvSink(raw_path, injury_path, daily_path, columnar=args.columnar) as sink:
+        for chunk in chunks:
+            sink.write(chunk)
+        sink.finish(start_date, end_date)
+    if sink.out_of_order:
+        print(
+            f"[WARN] {label}: {sink.out_of_order} ventanas empiezan antes de la anterior; "
+            "el CSV no queda ordenado del todo por fecha",
+            file=sys.stderr,
+        )
+    # La corrida terminó: los checkpoints ya no hacen falta
+    clear_checkpoints(args.checkpoint_dir, windows, sport_id)
+
+    return {
+        "sport_id": sport_id,
+        "paths": sink.paths,
+        "rows": sink.rows,
+        "injury_rows": sink.injury_rows,
+        "registrations": sink.registrations,
+    }
+
+
 def main() -> int:
     args = parse_args()
     if args.start_year > args.end_year:
         raise SystemExit("start-year debe ser <= end-year")
+    if args.workers < 1:
+        raise SystemExit("workers debe ser >= 1")
+    if args.cpu_workers < 1:
+        raise SystemExit("cpu-workers debe ser >= 1")
+    if args.stream and args.engine == "async":
+        raise SystemExit("--stream solo está disponible con --engine threads")
+    try:
+        split_year(args.start_year, args.chunk)
+    except ValueError:
+        raise SystemExit('chunk debe ser "year", "month" o un número de días >= 1')
+    try:
+        sports = list(dict.fromkeys(int(s) for s in args.sports.split(",") if s.strip()))
+    except ValueError:
+        raise SystemExit("sports debe ser una lista de sportId separados por coma, p. ej. 1,11,12")
+    if not sports:
+        raise SystemExit("sports debe incluir al menos un sportId")
+    if args.incremental:
+        for sport_id in sports:
+            raw_path = output_paths(args.outdir, args.start_year, args.end_year, sport_id)[0]
+            if not raw_path.exists():
+                raise SystemExit(f"No existe {raw_path}; corre primero sin --incremental")
 
-    all_rows: List[Dict[str, object]] = []
-    for year in range(args.start_year, args.end_year + 1):
-        start = f"{year}-01-01"
-        end = f"{year}-12-31"
-        url = build_url(start, end, sport_id=1)
-        print(f"[INFO] Descargando {year}...", file=sys.stderr)
-        payload = fetch_json(url)
-        txs = payload.get("transactions", [])
-        print(f"[INFO] {year}: {len(txs)} transacciones", file=sys.stderr)
-        for tx in txs:
-            all_rows.append(flatten_transaction(tx))
-        time.sleep(args.sleep)
-
-    # Orden por fecha/evento y id para trazabilidad
-    all_rows.sort(key=lambda r: ((r.get("event_date") or ""), (r.get("transaction_id") or 0)))
+    global BASE_URL, RESPONSE_CACHE, RATE_LIMITER, FIXTURE_RECORDER, RETRY_POLICY, CIRCUIT_BREAKER
+    global CPU_POOL, CPU_WORKERS
+    gc.set_threshold(*GC_THRESHOLD)
+    RETRY_POLICY = RetryPolicy(args.retries, args.backoff_base, args.backoff_max)
+    CIRCUIT_BREAKER = (
+        CircuitBreaker(args.breaker_threshold, args.breaker_cooldown)
+        if args.breaker_threshold > 0
+        else None
+    )
+    BASE_URL = f"{args.api_root.rstrip('/')}/transactions"
+    if args.record_dir is not None:
+        FIXTURE_RECORDER = FixtureRecorder(args.record_dir)
+    rate, burst = args.rate, args.burst
+    if args.sleep is not None and args.sleep > 0:
+        rate, burst = 1 / args.sleep, 1
+    if rate <= 0 or burst < 1:
+        raise SystemExit("rate debe ser > 0 y burst >= 1")
+    max_rate = args.max_rate if args.max_rate is not None else 2 * rate
+    RATE_LIMITER = RateLimiter(rate=rate, burst=burst, max_rate=max(rate, max_rate))
 
-    injury_rows = [r for r in all_rows if int(r.get("is_injury_related", 0) or 0) == 1]
-    for r in injury_rows:
-        r["count_as_new_injury_registration"] = int(r.get("count_as_new_injury_registration", 0) or 0)
+    if not args.no_cache:
+        RESPONSE_CACHE = ResponseCache(
+            args.cache_dir,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            current_ttl=args.cache_ttl,
+            revalidate=args.revalidate,
+        )
 
     start_date = date(args.start_year, 1, 1)
     end_date = date(args.end_year, 12, 31)
-    daily_rows = build_daily_series(injury_rows, start_date, end_date)
 
-    raw_path = args.outdir / f"mlb_transactions_flat_{args.start_year}_{args.end_year}.csv"
-    injury_path = args.outdir / f"mlb_injury_transactions_{args.start_year}_{args.end_year}.csv"
-    daily_path = args.outdir / f"mlb_injuries_daily_{args.start_year}_{args.end_year}.csv"
-
-    write_csv(raw_path, all_rows, RAW_COLUMNS)
-    write_csv(injury_path, injury_rows, INJURY_COLUMNS)
-    write_csv(daily_path, daily_rows, DAILY_COLUMNS)
+    if args.cpu_workers > 1:
+        # "spawn": los hilos de descarga ya corren cuando el pool arranca procesos
+        CPU_WORKERS = args.cpu_workers
+        CPU_POOL = ProcessPoolExecutor(
+            max_workers=args.cpu_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    try:
+        if len(sports) == 1 or args.sport_workers <= 1:
+            summaries = [run_sport(args, sport_id, start_date, end_date) for sport_id in sports]
+        else:
+            # Cada nivel comparte HTTP_POOL y RATE_LIMITER; como mucho --sport-workers niveles
+            # tienen sus filas en memoria a la vez, sin importar cuántos se pidan.
+            with ThreadPoolExecutor(max_workers=args.sport_workers) as pool:
+                futures = [
+                    pool.submit(run_sport, args, sport_id, start_date, end_date)
+                    for sport_id in sports
+                ]
+                summaries = [fut.result() for fut in futures]
+    finally:
+        if CPU_POOL is not None:
+            CPU_POOL.shutdown(cancel_futures=True)
+            CPU_POOL = None
 
     print("\n[OK] Archivos generados:", file=sys.stderr)
-    print(f"  - {raw_path}", file=sys.stderr)
-    print(f"  - {injury_path}", file=sys.stderr)
-    print(f"  - {daily_path}", file=sys.stderr)
-    print(f"  Total transacciones MLB: {len(all_rows)}", file=sys.stderr)
-    print(f"  Eventos de lesión (IL/rehab): {len(injury_rows)}", file=sys.stderr)
-    print(
-        f"  Nuevas lesiones registradas (sum): "
-        f"{sum(int(r.get('count_as_new_injury_registration', 0) or 0) for r in injury_rows)}",
-        file=sys.stderr,
-    )
+    for summary in summaries:
+        label = sport_label(int(summary["sport_id"]))
+        for path in summary["paths"]:
+            print(f"  - {path}", file=sys.stderr)
+        print(f"  Total transacciones {label}: {summary['rows']}", file=sys.stderr)
+        print(f"  Eventos de lesión (IL/rehab): {summary['injury_rows']}", file=sys.stderr)
+        print(f"  Nuevas lesiones registradas (sum): {summary['registrations']}", file=sys.stderr)
+    classify = classify_cache_stats()
+    if classify["hits"] or classify["misses"]:
+        print(
+            f"  Clasificador: {classify['templates']} plantillas en cache, "
+            f"{classify['hit_rate']:.1%} aciertos",
+            file=sys.stderr,
+        )
+    net = FETCH_METRICS.summary()
+    if net["requests"]:
+        ratio = net["body_bytes"] / net["wire_bytes"] if net["wire_bytes"] else 0.0
+        print(
+            f"  Red: {net['requests']} peticiones ({net['retries']} reintentos, "
+            f"{net['failed']} fallidas), {net['wire_bytes']} bytes transferidos, "
+            f"{net['body_bytes']} bytes descomprimidos (x{ratio:.1f})",
+            file=sys.stderr,
+        )
+        print(
+            f"  Latencia: p50 {net['latency_p50']:.2f}s, máx {net['latency_max']:.2f}s",
+            file=sys.stderr,
+        )
+    if args.metrics_out is not None:
+        write_csv(args.metrics_out, FETCH_METRICS.requests, METRICS_SCHEMA)
+    if RESPONSE_CACHE is not None:
+        stats = RESPONSE_CACHE.stats()
+        print(
+            f"  Cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['revalidated']} sin cambios (304)",
+            file=sys.stderr,
+        )
     return 0
 
 
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local que imita /api/v1/transactions y /api/v1/schedule de statsapi.mlb.com,
+para probar y medir el pipeline de descarga sin red.
+
+Los datos salen de fixtures grabados con `fetch_mlb_injuries_transactions.py --record-dir`
+o, si no hay fixtures, del CSV flat ya generado (--from-csv). Permite simular latencia,
+errores del servidor y límite de peticiones (429 + Retry-After).
+
+Ejemplo:
+    python scripts/fetch_mlb_injuries_transactions.py --record-dir fixtures/mlb
+    python scripts/mlb_api_stub.py --fixtures fixtures/mlb --port 8765 --latency 0.05 --error-rate 0.02
+    python scripts/fetch_mlb_injuries_transactions.py --api-root http://127.0.0.1:8765/api/v1 --no-cache
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from fetch_mlb_injuries_transactions import (
+    RateLimiter,
+    TransactionRow,
+    choose_event_date,
+    iter_fixtures,
+    read_flat_csv,
+    stitch_windows,
+)
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0  # segundos añadidos a cada respuesta
+    jitter: float = 0.0  # variación aleatoria (+/-) sobre latency
+    error_rate: float = 0.0  # probabilidad de responder error_status
+    error_status: int = 503
+    rate: Optional[float] = None  # peticiones/seg antes de responder 429
+    burst: int = 1
+    gzip: bool = True
+    etag: bool = True  # ETag + 304 ante If-None-Match
+    seed: Optional[int] = None
+
+
+def request_key(path: str, query: str) -> str:
+    # Misma normalización que normalize_url, sin esquema ni host
+    return f"{path}?{urlencode(sorted(parse_qsl(query, keep_blank_values=True)))}"
+
+
+def row_to_transaction(row: TransactionRow) -> dict:
+    # Reconstruye una transacción con la forma de la API desde una fila del CSV flat
+    tx: Dict[str, object] = {
+        "id": row.transaction_id,
+        "date": row.api_date,
+        "effectiveDate": row.effective_date,
+        "resolutionDate": row.resolution_date,
+        "typeCode": row.type_code,
+        "typeDesc": row.type_desc,
+        "description": row.description,
+    }
+    if row.person_id is not None:
+        tx["person"] = {"id": row.person_id, "fullName": row.person_name}
+    if row.from_team_id is not None:
+        tx["fromTeam"] = {"id": row.from_team_id, "name": row.from_team_name}
+    if row.to_team_id is not None:
+        tx["toTeam"] = {"id": row.to_team_id, "name": row.to_team_name}
+    return {k: v for k, v in tx.items() if v is not None}
+
+
+class FixtureStore:
+    """Respuestas grabadas (exactas, en gzip) y transacciones indexadas para rangos arbitrarios."""
+
+    def __init__(self) -> None:
+        self.exact: Dict[str, bytes] = {}
+        self.transactions: Dict[int, List[Tuple[str, dict]]] = {}
+
+    def _set_transactions(self, by_sport: Dict[int, List[List[dict]]]) -> None:
+        for sport_id, chunks in by_sport.items():
+            txs = [(choose_event_date(tx) or "", tx) for tx in stitch_windows(chunks)]
+            txs.sort(key=lambda item: item[0])
+            self.transactions[sport_id] = txs
+
+    @classmethod
+    def from_fixtures(cls, root: Path) -> "FixtureStore":
+        store = cls()
+        by_sport: Dict[int, List[List[dict]]] = {}
+        for url, body_path in iter_fixtures(root):
+            parts = urlsplit(url)
+            compressed = body_path.read_bytes()
+            store.exact[request_key(parts.path, parts.query)] = compressed
+            if parts.path.endswith("/transactions"):
+                params = dict(parse_qsl(parts.query))
+                sport_id = int(params.get("sportId", 1))
+                payload = json.loads(gzip.decompress(compressed))
+                by_sport.setdefault(sport_id, []).append(payload.get("transactions", []))
+        store._set_transactions(by_sport)
+        return store
+
+    @classmethod
+    def from_csv(cls, path: Path, sport_id: int = 1) -> "FixtureStore":
+        store = cls()
+        txs = [row_to_transaction(row) for row in read_flat_csv(path)]
+        store._set_transactions({sport_id: [txs]})
+        return store
+
+    def transactions_between(self, sport_id: int, start: str, end: str) -> List[dict]:
+        return [tx for d, tx in self.transactions.get(sport_id, []) if start <= d <= end]
+
+
+def make_handler(store: FixtureStore, config: StubConfig) -> type:
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+    limiter = RateLimiter(rate=config.rate, burst=config.burst) if config.rate else None
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: bytes, compressed: bool = False, extra: Optional[Dict[str, str]] = None) -> None:
+            if status == 200 and config.etag:
+                etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+                extra = {**(extra or {}), "ETag": etag}
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+            wants_gzip = config.gzip and "gzip" in self.headers.get("Accept-Encoding", "")
+            if compressed and not wants_gzip:
+                body, compressed = gzip.decompress(body), False
+            elif not compressed and wants_gzip and body:
+                body, compressed = gzip.compress(body, compresslevel=6), True
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json;charset=UTF-8")
+            if compressed:
+                self.send_header("Content-Encoding", "gzip")
+            for name, value in (extra or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status: int, message: str, extra: Optional[Dict[str, str]] = None) -> None:
+            body = json.dumps({"messageNumber": status, "message": message}).encode("utf-8")
+            self._send(status, body, extra=extra)
+
+        def do_GET(self) -> None:
+            if limiter is not None:
+                wait = limiter.try_acquire()
+                if wait > 0:
+                    self._error(429, "Too Many Requests", {"Retry-After": f"{max(1, round(wait))}"})
+                    return
+
+            with rng_lock:
+                delay = config.latency + (rng.uniform(-config.jitter, config.jitter) if config.jitter else 0.0)
+                fail = rng.random() < config.error_rate
+            if delay > 0:
+                time.sleep(delay)
+            if fail:
+                self._error(config.error_status, "Error simulado")
+                return
+
+            parts = urlsplit(self.path)
+            exact = store.exact.get(request_key(parts.path, parts.query))
+            if exact is not None:
+                self._send(200, exact, compressed=True)
+                return
+
+            if parts.path.endswith("/transactions"):
+                params = dict(parse_qsl(parts.query))
+                if not params.get("startDate") or not params.get("endDate"):
+                    self._error(400, "startDate y endDate son obligatorios")
+                    return
+                txs = store.transactions_between(
+                    int(params.get("sportId", 1)), params["startDate"], params["endDate"]
+                )
+                payload = {"copyright": "Stub local de statsapi.mlb.com", "transactions": txs}
+                self._send(200, json.dumps(payload).encode("utf-8"))
+                return
+
+            self._error(404, f"Sin fixture para {self.path}")
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    return Handler
+
+
+def start_server(
+    store: FixtureStore,
+    config: Optional[StubConfig] = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> ThreadingHTTPServer:
+    # Arranca en un hilo de fondo; server.server_port tiene el puerto asignado
+    server = ThreadingHTTPServer((host, port), make_handler(store, config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser()
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--fixtures", type=Path, help="Directorio grabado con --record-dir")
+    src.add_argument("--from-csv", type=Path, help="CSV flat (mlb_transactions_flat_*.csv)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.0, help="Segundos añadidos por respuesta")
+    p.add_argument("--jitter", type=float, default=0.0, help="Variación aleatoria de la latencia")
+    p.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de error simulado")
+    p.add_argument("--error-status", type=int, default=503)
+    p.add_argument("--rate", type=float, default=None, help="Peticiones/seg antes de responder 429")
+    p.add_argument("--burst", type=int, default=1)
+    p.add_argument("--no-gzip", action="store_true", help="Nunca comprime las respuestas")
+    p.add_argument("--no-etag", action="store_true", help="No envía ETag ni responde 304")
+    p.add_argument("--seed", type=int, default=None, help="Semilla para latencia/errores")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.fixtures is not None:
+        store = FixtureStore.from_fixtures(args.fixtures)
+    else:
+        store = FixtureStore.from_csv(args.from_csv)
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate=args.rate,
+        burst=args.burst,
+        gzip=not args.no_gzip,
+        etag=not args.no_etag,
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store, config))
+    total = sum(len(txs) for txs in store.transactions.values())
+    print(
+        f"[INFO] Stub en http://{args.host}:{server.server_port}/api/v1 "
+        f"({len(store.exact)} fixtures, {total} transacciones)",
+        file=sys.stderr,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())